@@ -0,0 +1,72 @@
+"""
+Бэкенд PostgreSQL, берущий соединения из пула psycopg_pool.
+
+Django закрывает соединение в конце каждого запроса, а этот бэкенд вместо
+закрытия возвращает его в пул процесса. Параметры пула задаются ключом
+POOL в настройках базы данных.
+"""
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError as error:
+    raise ImproperlyConfigured(
+        f"Для пула соединений нужен пакет psycopg-pool: {error}"
+    )
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        pool = _pools.get(self.alias)
+        if pool is not None:
+            return pool
+        with _pools_lock:
+            if self.alias not in _pools:
+                _pools[self.alias] = self.create_pool()
+        return _pools[self.alias]
+
+    def create_pool(self):
+        if self.settings_dict["CONN_MAX_AGE"]:
+            raise ImproperlyConfigured(
+                "Пул соединений нельзя совмещать с CONN_MAX_AGE"
+            )
+        options = self.settings_dict.get("POOL", {})
+        return ConnectionPool(
+            kwargs=self.get_connection_params(),
+            min_size=options.get("MIN_SIZE", 1),
+            max_size=options.get("MAX_SIZE", 4),
+            timeout=options.get("TIMEOUT", 10),
+            max_lifetime=options.get("MAX_LIFETIME", 3600),
+            max_idle=options.get("MAX_IDLE", 600),
+            check=(
+                ConnectionPool.check_connection
+                if self.settings_dict["CONN_HEALTH_CHECKS"]
+                else None
+            ),
+            name=f"foodgram-{self.alias}",
+            open=True,
+        )
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict["OPTIONS"]
+        connection = self.pool.getconn()
+        if "isolation_level" in options:
+            self.isolation_level = base.IsolationLevel(
+                options["isolation_level"]
+            )
+            connection.isolation_level = self.isolation_level
+        else:
+            self.isolation_level = base.IsolationLevel.READ_COMMITTED
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
@@ -41,6 +41,7 @@ USERNAME_CHARSET = r"^[\w.@+-]+$"
 INSTALLED_APPS = [
     "users.apps.UsersConfig",
     "recipes.apps.RecipesConfig",
+    "profiler.apps.ProfilerConfig",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -55,15 +56,20 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "helpfiles.shedding.LoadSheddingMiddleware",
+    "helpfiles.compression.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "profiler.middleware.RequestProfilerMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
-ROOT_URLCONF = "foodgram.urls"
+# Под ASGI asgi.py подключает foodgram.urls_async с асинхронными
+# представлениями чтения.
+ROOT_URLCONF = os.getenv("ROOT_URLCONF", "foodgram.urls")
 
 TEMPLATES = [
     {
@@ -87,18 +93,138 @@ WSGI_APPLICATION = "foodgram.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+DB_POOL = os.getenv("DB_POOL", "False") == "True"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": (
+            "foodgram.postgresql_pool"
+            if DB_POOL
+            else "django.db.backends.postgresql"
+        ),
         "NAME": os.getenv("POSTGRES_DB"),
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT"),
         "ATOMIC_REQUESTS": True,
+        # С пулом соединение возвращается в пул в конце каждого запроса,
+        # поэтому постоянные соединения Django в этом режиме отключены.
+        "CONN_MAX_AGE": 0 if DB_POOL else int(
+            os.getenv("DB_CONN_MAX_AGE", 60)
+        ),
+        "CONN_HEALTH_CHECKS": (
+            os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True"
+        ),
+        "POOL": {
+            "MIN_SIZE": int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+            "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", 4)),
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            "MAX_LIFETIME": float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+            "MAX_IDLE": float(os.getenv("DB_POOL_MAX_IDLE", 600)),
+        },
     }
 }
 
+# Реплики для чтения: DB_REPLICA_HOSTS=host1,host2. Закрепление клиента за
+# основной БД после записи хранится в кэше по умолчанию, поэтому с
+# несколькими воркерами кэш должен быть общим.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), start=1
+):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "ATOMIC_REQUESTS": False,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{index}")
+
+DATABASE_ROUTERS = ["helpfiles.db_routing.ReplicaRouter"]
+
+REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 5))
+
+# Кэш общий для всех воркеров: в нём закреплённые за мастером клиенты и
+# справочники, сбрасываемые сигналами.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "/tmp/foodgram-cache"),
+    },
+    # Корзины ограничения частоты запросов, см. helpfiles/throttling.py.
+    "throttle": {
+        "BACKEND": os.getenv(
+            "THROTTLE_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "THROTTLE_CACHE_LOCATION", "/tmp/foodgram-throttle"
+        ),
+    },
+    # Счётчики, см. helpfiles/metrics.py.
+    "metrics": {
+        "BACKEND": os.getenv(
+            "METRICS_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "METRICS_CACHE_LOCATION", "/tmp/foodgram-metrics"
+        ),
+    },
+    # Поколение кэша ленты, см. recipes/feed.py. Отдельный кэш, чтобы
+    # ключ не вытеснялся записями основного кэша.
+    "feed_generation": {
+        "BACKEND": os.getenv(
+            "FEED_GENERATION_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "FEED_GENERATION_CACHE_LOCATION", "/tmp/foodgram-feed-generation"
+        ),
+    },
+}
+
+THROTTLE_CACHE = "throttle"
+
+METRICS_CACHE = "metrics"
+
+FEED_GENERATION_CACHE = "feed_generation"
+
+# Ограничение времени SQL-запросов по областям представлений, мс; см.
+# helpfiles/timeouts.py. Действия без своей области получают default.
+STATEMENT_TIMEOUTS = {
+    "default": int(os.getenv("STATEMENT_TIMEOUT", 5000)),
+    "recipe_list": int(os.getenv("STATEMENT_TIMEOUT_RECIPE_LIST", 2000)),
+    "ingredient_search": int(
+        os.getenv("STATEMENT_TIMEOUT_INGREDIENT_SEARCH", 1000)
+    ),
+    "shopping_cart_pdf": int(
+        os.getenv("STATEMENT_TIMEOUT_SHOPPING_CART_PDF", 5000)
+    ),
+}
+
+# Одновременных запросов к группе эндпоинтов на сервер, лишние получают
+# 503; см. helpfiles/shedding.py.
+LOAD_SHEDDING = {
+    "shopping_cart_pdf": {
+        "path": r"^/api/recipes/download_shopping_cart/$",
+        "limit": int(os.getenv("LOAD_SHEDDING_SHOPPING_CART_PDF", 4)),
+    },
+    "recipe_list": {
+        "path": r"^/api/recipes/$",
+        # Создание рецепта не занимает слоты чтения списка.
+        "methods": ("GET", "HEAD"),
+        "limit": int(os.getenv("LOAD_SHEDDING_RECIPE_LIST", 32)),
+    },
+}
+
+LOAD_SHEDDING_DIR = os.getenv(
+    "LOAD_SHEDDING_DIR", "/tmp/foodgram-shedding"
+)
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -142,6 +268,15 @@ STATIC_ROOT = BASE_DIR / "collected_static"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Выгрузки списка покупок: каталог вне MEDIA_ROOT и внутренний location
+# nginx, из которого он отдаёт их по X-Accel-Redirect.
+EXPORTS_ROOT = os.getenv("EXPORTS_ROOT", os.path.join(BASE_DIR, "exports"))
+EXPORTS_URL = "/protected/exports/"
+
+# Незавершённые и ещё не использованные загрузки изображений рецептов.
+UPLOADS_ROOT = os.getenv("UPLOADS_ROOT", os.path.join(BASE_DIR, "uploads"))
+USE_X_ACCEL_REDIRECT = os.getenv("USE_X_ACCEL_REDIRECT", "False") == "True"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -156,6 +291,32 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "helpfiles.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "helpfiles.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "DEFAULT_THROTTLE_CLASSES": [
+        "helpfiles.throttling.TokenBucketThrottle",
+        "helpfiles.throttling.IPTokenBucketThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "shopping_cart_pdf": "10/min",
+        "shopping_cart_pdf_ip": "30/min",
+        "ingredient_search": "120/min",
+        "ingredient_search_ip": "600/min",
+        "recipe_write": "30/hour",
+        "recipe_write_ip": "100/hour",
+        "image_upload": "60/hour",
+        "image_upload_ip": "200/hour",
+    },
+    # Адрес клиента для ограничений по IP берётся из X-Forwarded-For,
+    # который дописывает nginx.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "1")),
 }
 
 DJOSER = {
@@ -5,5 +5,6 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("users.urls")),
     path("api/", include("recipes.urls")),
+    path("api/", include("profiler.urls")),
     path("api/auth/", include("djoser.urls.authtoken")),
 ]
@@ -0,0 +1,14 @@
+from django.urls import path
+
+from recipes import async_views
+
+from . import urls
+
+urlpatterns = [
+    path("api/recipes/", async_views.recipe_list),
+    path("api/recipes/<int:pk>/", async_views.recipe_detail),
+    path("api/tags/", async_views.tag_list),
+    path("api/tags/<int:pk>/", async_views.tag_detail),
+    path("api/ingredients/", async_views.ingredient_list),
+    *urls.urlpatterns,
+]
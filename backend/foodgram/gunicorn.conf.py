@@ -0,0 +1,62 @@
+"""
+Настройки gunicorn.
+
+Приложение загружается в мастер-процессе до форка (preload_app), и
+воркеры получают уже импортированные Django, DRF и ReportLab как общие
+страницы памяти. Соединения с БД и пулы postgresql_pool создаются
+лениво в каждом процессе, поэтому мастер не должен открывать их до
+форка. Каждый воркер после загрузки заполняет кэш справочников, чтобы
+первые запросы не платили за прогрев, и перезапускается после
+max_requests запросов, ограничивая рост памяти.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(
+    os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1)
+)
+# При threads > 1 синхронный воркер заменяется на gthread.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+# Разброс, чтобы воркеры не перезапускались одновременно.
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+# Файл heartbeat в памяти: запись в overlayfs контейнера может
+# блокировать воркер.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def when_ready(server):
+    """Мастер: догружает модули до форка, если приложение загружено"""
+    if not preload_app:
+        return
+    from django.db import connections
+    from django.urls import get_resolver
+
+    from recipes.exports import register_font
+
+    # Импорт urls подтягивает представления и сериализаторы.
+    get_resolver().url_patterns
+    register_font()
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    """Воркер: прогрев после загрузки приложения"""
+    from django.db import connections
+
+    from recipes.catalogs import warm_catalogs
+    from recipes.exports import register_font
+
+    register_font()
+    try:
+        warm_catalogs()
+    except Exception:
+        # Воркер должен запуститься и при недоступной БД.
+        worker.log.exception("Не удалось прогреть кэш справочников")
+    finally:
+        connections.close_all()
@@ -15,3 +15,10 @@ class BaseModelMixin(models.Model):
 
     class Meta:
         abstract = True
+
+
+class SoftDeleteManager(models.Manager):
+    """Менеджер без объектов, помеченных на удаление (deleted_at)"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
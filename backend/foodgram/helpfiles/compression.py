@@ -0,0 +1,149 @@
+import gzip
+import re
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async
+)
+from helpfiles import constants
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPT_ENCODING_RE = re.compile(r"\s*([\w*-]+)\s*(?:;\s*q=([\d.]+))?")
+
+
+def get_encodings():
+    """Поддерживаемые кодировки в порядке предпочтения"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(request):
+    """Лучшая из поддерживаемых кодировок по заголовку Accept-Encoding"""
+    accepted = {}
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        match = ACCEPT_ENCODING_RE.match(item)
+        if not match:
+            continue
+        try:
+            quality = float(match[2] or 1)
+        except ValueError:
+            continue
+        accepted[match[1].lower()] = quality
+    encodings = [
+        encoding
+        for encoding in get_encodings()
+        if accepted.get(encoding, accepted.get("*", 0)) > 0
+    ]
+    return max(
+        encodings,
+        key=lambda encoding: accepted.get(encoding, accepted.get("*")),
+        default=None,
+    )
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(
+            content, quality=constants.COMPRESSION_BROTLI_QUALITY
+        )
+    return gzip.compress(
+        content, compresslevel=constants.COMPRESSION_GZIP_LEVEL, mtime=0
+    )
+
+
+def precompress(content):
+    """Тело ответа во всех поддерживаемых кодировках для кэша"""
+    variants = {"identity": content}
+    if len(content) >= constants.COMPRESSION_MIN_LENGTH:
+        for encoding in get_encodings():
+            variants[encoding] = compress(content, encoding)
+    return variants
+
+
+class CompressionMiddleware:
+    """Сжимает ответы API в gzip или brotli по Accept-Encoding.
+
+    Уже сжатые варианты тела (атрибут ответа precompressed, см.
+    precompress) отдаются без повторного сжатия."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if (
+            not request.path_info.startswith(constants.COMPRESSION_PATH)
+            or response.streaming
+            or response.has_header("Content-Encoding")
+        ):
+            return response
+        variants = getattr(response, "precompressed", None)
+        if variants is None and (
+            len(response.content) < constants.COMPRESSION_MIN_LENGTH
+        ):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate(request)
+        if encoding is None:
+            return response
+        if variants is not None:
+            content = variants.get(encoding)
+            if content is None:
+                return response
+        else:
+            content = compress(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = encoding
+        # Как GZipMiddleware: сжатое тело - другое представление ресурса.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+
+def get_precompressed(key, render, timeout):
+    """Варианты тела из кэша; render строит тело при промахе"""
+    variants = cache.get(key)
+    if variants is None:
+        variants = precompress(render())
+        cache.set(key, variants, timeout)
+    return variants
+
+
+async def aget_precompressed(key, render, timeout):
+    variants = await cache.aget(key)
+    if variants is None:
+        variants = precompress(await sync_to_async(render)())
+        await cache.aset(key, variants, timeout)
+    return variants
+
+
+def precompressed_response(variants, content_type="application/json"):
+    response = HttpResponse(variants["identity"], content_type=content_type)
+    response.precompressed = variants
+    return response
@@ -0,0 +1,55 @@
+import hashlib
+
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """ETag из хэша произвольных значений"""
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+def latest(*timestamps):
+    """Самая поздняя из известных дат изменения"""
+    return max(
+        (value for value in timestamps if value is not None), default=None
+    )
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """Ответ 304/412, если валидаторы клиента совпали, иначе None"""
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    # ETag одинаков для JSON и browsable API, поэтому ответ зависит и от
+    # Accept.
+    patch_vary_headers(response, ("Authorization", "Accept"))
+    return response
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 по ETag/Last-Modified до сериализации ответа"""
+
+    def conditional_response(self, etag, last_modified, get_response):
+        """get_response вызывается, только если валидаторы клиента
+        устарели"""
+        response = get_not_modified_response(
+            self.request, etag, last_modified
+        )
+        if response is None:
+            response = get_response()
+        return set_validators(response, etag, last_modified)
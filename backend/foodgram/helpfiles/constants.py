@@ -6,3 +6,48 @@ MIN_INGREDIENT_AMOUNT = 1
 NAME_MAX_LEN = 200
 COLOR_MAX_LEN = 7
 SLUG_MAX_LEN = 200
+METHOD_MAX_LEN = 10
+PROFILER_HEADER = "X-Profile"
+PROFILER_QUERY_PARAM = "profile"
+PROFILER_STATS_LIMIT = 60
+PROFILER_EXPLAIN_LIMIT = 50
+RECIPES_BATCH_MAX_LEN = 100
+FIELDS_QUERY_PARAM = "fields"
+OMIT_QUERY_PARAM = "omit"
+COMPRESSION_PATH = "/api/"
+COMPRESSION_MIN_LENGTH = 200
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+CATALOG_CACHE_TIMEOUT = 60 * 60
+POPULARITY_CHECKPOINT = "popularity"
+POPULARITY_HALF_LIFE_DAYS = 7
+POPULARITY_FAVORITE_WEIGHT = 1.0
+POPULARITY_SHOPPING_CART_WEIGHT = 2.0
+POPULARITY_SETTLE_SECONDS = 60
+POPULARITY_BATCH_SIZE = 5000
+SIMILAR_RECIPES_TOP_K = 10
+SIMILAR_RECIPES_CHUNK_SIZE = 200
+SIMILAR_RECIPES_MAX_DF = 0.05
+SIMILAR_RECIPES_MIN_DF = 2
+SIMILAR_RECIPES_MAX_DF_MIN_RECIPES = 1000
+SIMILAR_RECIPES_LOAD_BATCH_SIZE = 100000
+SIMILAR_RECIPES_SAVE_BATCH_SIZE = 5000
+ADMIN_EXACT_COUNT_LIMIT = 100000
+EXPORTS_MAX_AGE_DAYS = 7
+RECIPE_CARDS_BATCH_SIZE = 1000
+FEED_CACHE_TIMEOUT = 30
+FEED_CACHE_STALE = 5 * 60
+FEED_CACHE_MAX_PAGE = 5
+FEED_CACHE_MAX_LIMIT = 50
+FEED_LOCK_TIMEOUT = 10
+FEED_LOCK_WAIT = 2
+FEED_LOCK_POLL = 0.05
+PURGE_DELAY_HOURS = 24
+PURGE_BATCH_SIZE = 1000
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_SIDE = 4096
+IMAGE_UPLOAD_FORMATS = ("JPEG", "PNG", "GIF", "WEBP")
+IMAGE_UPLOAD_MAX_PENDING = 10
+IMAGE_UPLOAD_READ_SIZE = 64 * 1024
+IMAGE_UPLOAD_MAX_AGE_HOURS = 24
+IMAGE_EXTENSION_MAX_LEN = 10
@@ -0,0 +1,91 @@
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+# Реплика, выбранная для текущего запроса; None - чтение из основной БД.
+_read_replica = ContextVar("read_replica", default=None)
+
+
+class ReplicaRouter:
+    """Отправляет чтение в реплику, если его разрешил текущий запрос"""
+
+    def db_for_read(self, model, **hints):
+        return _read_replica.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def get_sticky_key(request):
+    """Ключ клиента: токен авторизации, а без него IP-адрес. Адрес
+    берётся из X-Forwarded-For, как и для ограничений частоты: REMOTE_ADDR
+    за nginx у всех клиентов одинаковый"""
+    credentials = request.META.get(
+        "HTTP_AUTHORIZATION"
+    ) or BaseThrottle().get_ident(request)
+    return "primary-pin:" + hashlib.sha256(credentials.encode()).hexdigest()
+
+
+@contextmanager
+def replica_reads(request):
+    """Разрешает чтение из реплики, если клиент не закреплён за основной
+    БД. Реплика выбирается одна на запрос: все его чтения видят один
+    снимок данных"""
+    if not settings.DATABASE_REPLICAS or cache.get(get_sticky_key(request)):
+        yield
+        return
+    token = _read_replica.set(random.choice(settings.DATABASE_REPLICAS))
+    try:
+        yield
+    finally:
+        _read_replica.reset(token)
+
+
+class NonAtomicReadsMixin:
+    """Не оборачивает безопасные запросы в транзакцию ATOMIC_REQUESTS,
+    запросы на запись по-прежнему выполняются атомарно"""
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        view = super().as_view(*args, **initkwargs)
+        return transaction.non_atomic_requests(view)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with transaction.atomic():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaReadsMixin:
+    """Читает безопасные запросы из реплик. После записи клиент на
+    REPLICA_STICKY_SECONDS закрепляется за основной БД, чтобы видеть
+    собственные изменения"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            with replica_reads(request):
+                return super().dispatch(request, *args, **kwargs)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if settings.DATABASE_REPLICAS:
+                cache.set(
+                    get_sticky_key(request),
+                    True,
+                    settings.REPLICA_STICKY_SECONDS,
+                )
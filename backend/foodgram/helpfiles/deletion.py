@@ -0,0 +1,77 @@
+"""
+Удаление объектов с большим числом зависимых строк.
+
+Удаление автора или популярного рецепта через Model.delete() собирает
+каскад в Python и удаляет всё в одной долгой транзакции, которая
+блокирует другие записи. Вместо этого объект помечается deleted_at и
+сразу скрывается менеджером SoftDeleteManager, а purge удаляет его
+позже пачками: сначала зависимые строки по CASCADE-связям, каждая пачка
+в своей короткой транзакции, затем сами объекты. Модели без зависимых и
+без сигналов удаляются запросом DELETE по первичным ключам, не загружая
+строки в Python.
+"""
+from django.db import models, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+
+def get_cascades(model):
+    """Связи, по которым удаление model удаляет зависимые строки"""
+    return [
+        relation
+        for relation in get_candidate_relations_to_delete(model._meta)
+        if relation.on_delete is models.CASCADE
+    ]
+
+
+def purge(queryset, batch_size, report=None):
+    """Удаляет объекты queryset с зависимыми пачками по batch_size.
+    report(model, count) вызывается после каждой пачки. Возвращает
+    число удалённых объектов queryset"""
+    model = queryset.model
+    total = 0
+    while True:
+        ids = list(
+            queryset.order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        for relation in get_cascades(model):
+            related_model = relation.related_model
+            purge(
+                related_model._base_manager.filter(
+                    **{f"{relation.field.name}__in": ids}
+                ),
+                batch_size,
+                report,
+            )
+        with transaction.atomic():
+            # Зависимые уже удалены; строки, появившиеся после этого,
+            # удалит сборщик Django.
+            model._base_manager.filter(pk__in=ids).delete()
+        total += len(ids)
+        if report is not None:
+            report(model, len(ids))
+
+
+class SoftDeleteAdminMixin:
+    """Удаление в админке помечает объекты вместо каскадного удаления.
+    Модельный админ задаёт soft_delete_func(queryset)"""
+
+    soft_delete_func = None
+
+    def get_deleted_objects(self, objs, request):
+        # Страница подтверждения не собирает каскад зависимых объектов.
+        objs = list(objs)
+        opts = self.model._meta
+        return (
+            [str(obj) for obj in objs],
+            {opts.verbose_name_plural: len(objs)},
+            set(),
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        self.soft_delete_func(self.model._default_manager.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.soft_delete_func(queryset)
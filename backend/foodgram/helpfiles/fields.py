@@ -0,0 +1,61 @@
+from helpfiles import constants
+from rest_framework.exceptions import ValidationError
+
+
+def split_fields(value):
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+def get_requested_fields(request, available):
+    """Поля ответа по параметрам ?fields= и ?omit= в порядке available"""
+    fields = split_fields(
+        request.query_params.get(constants.FIELDS_QUERY_PARAM)
+    )
+    omit = split_fields(request.query_params.get(constants.OMIT_QUERY_PARAM))
+    unknown = [name for name in fields + omit if name not in available]
+    if unknown:
+        raise ValidationError(
+            {
+                constants.FIELDS_QUERY_PARAM: [
+                    f"Неизвестные поля: {', '.join(unknown)}"
+                ]
+            }
+        )
+    return tuple(
+        name
+        for name in available
+        if (not fields or name in fields) and name not in omit
+    )
+
+
+class SparseFieldsMixin:
+    """Сериализатор, выводящий только поля из аргумента fields"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsViewMixin:
+    """Передаёт сериализатору поля из ?fields= и ?omit= для чтения"""
+
+    sparse_actions = ("list", "retrieve")
+
+    def get_sparse_fields(self):
+        serializer_class = self.get_serializer_class()
+        if (
+            self.action not in self.sparse_actions
+            or not hasattr(serializer_class, "Meta")
+        ):
+            return None
+        return get_requested_fields(
+            self.request, serializer_class.Meta.fields
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs["fields"] = fields
+        return super().get_serializer(*args, **kwargs)
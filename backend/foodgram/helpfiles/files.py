@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, HttpResponse
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище для файлов, названных по хэшу содержимого: файл с уже
+    существующим именем совпадает с сохранённым и не записывается"""
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def protected_file_response(path, internal_url, content_type, filename):
+    """Ответ с файлом после проверки прав в Django.
+
+    За nginx тело не передаётся через воркер: заголовок X-Accel-Redirect
+    указывает внутренний location, из которого nginx отдаёт файл сам.
+    Без nginx (USE_X_ACCEL_REDIRECT=False) файл отдаёт Django."""
+    if settings.USE_X_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = internal_url
+    else:
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,38 @@
+"""
+Счётчики событий, общие для всех воркеров.
+
+Значения хранятся в кэше METRICS_CACHE без срока жизни. Список
+счётчиков строится из настроек STATEMENT_TIMEOUTS и LOAD_SHEDDING, а
+читают их сотрудники через /api/metrics/.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+cache = caches[settings.METRICS_CACHE]
+
+KEY_PREFIX = "metrics:"
+
+
+def increment(name, delta=1):
+    key = KEY_PREFIX + name
+    if cache.add(key, delta, None):
+        return
+    # На файловом кэше incr не атомарен: при гонке воркеров счётчик
+    # может немного отстать, для наблюдения это допустимо.
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, None)
+
+
+def get_metric_names():
+    return [
+        *(f"statement_timeout.{name}" for name in settings.STATEMENT_TIMEOUTS),
+        *(f"shed.{name}" for name in settings.LOAD_SHEDDING),
+    ]
+
+
+def get_metrics():
+    names = get_metric_names()
+    values = cache.get_many([KEY_PREFIX + name for name in names])
+    return {name: values.get(KEY_PREFIX + name, 0) for name in names}
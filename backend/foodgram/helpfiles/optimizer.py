@@ -0,0 +1,106 @@
+"""
+Оптимизация queryset по полям сериализатора.
+
+По объявленным полям и их source строит select_related для прямых
+связей, Prefetch для множественных и only() для столбцов модели.
+Поля-методы и поля с source="*" не разбираются: методы получают объект
+только с выбранными столбцами и должны обходиться первичным ключом и
+аннотациями queryset.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+
+from rest_framework import serializers
+
+
+def get_optimizations(serializer, model, prefix=""):
+    """Списки (select_related, prefetch_related, only) для сериализатора
+    модели model; prefix - путь до неё от модели queryset"""
+    select, prefetch = [], []
+    only = [prefix + model._meta.pk.name]
+    for field in serializer.fields.values():
+        if field.write_only or field.source == "*":
+            continue
+        current = model
+        path = prefix
+        for index, attr in enumerate(field.source_attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Аннотация или свойство модели.
+                break
+            lookup = path + attr
+            is_last = index == len(field.source_attrs) - 1
+            if not model_field.is_relation:
+                only.append(lookup)
+                break
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch.append(
+                    get_prefetch(
+                        lookup, model_field, field if is_last else None
+                    )
+                )
+                break
+            if model_field.concrete:
+                only.append(lookup)
+            if is_last and isinstance(field, serializers.RelatedField):
+                if not model_field.concrete or not (
+                    field.use_pk_only_optimization()
+                ):
+                    select.append(lookup)
+                break
+            select.append(lookup)
+            if is_last and isinstance(field, serializers.BaseSerializer):
+                nested = get_optimizations(
+                    field, model_field.related_model, lookup + "__"
+                )
+                select += nested[0]
+                prefetch += nested[1]
+                only += nested[2]
+            current = model_field.related_model
+            path = lookup + "__"
+    return (
+        list(dict.fromkeys(select)),
+        prefetch,
+        list(dict.fromkeys(only)),
+    )
+
+
+def get_prefetch(lookup, model_field, field):
+    """Prefetch множественной связи с queryset по вложенному
+    сериализатору"""
+    related_model = model_field.related_model
+    queryset = related_model._default_manager.all()
+    if isinstance(field, serializers.ListSerializer):
+        required = ()
+        if model_field.one_to_many:
+            # Обратному внешнему ключу нужен столбец связи с родителем.
+            required = (model_field.field.name,)
+        queryset = optimize_queryset(queryset, field.child, required)
+    elif isinstance(field, serializers.ManyRelatedField):
+        queryset = queryset.only(related_model._meta.pk.name)
+    return Prefetch(lookup, queryset=queryset)
+
+
+def optimize_queryset(queryset, serializer, required=()):
+    """Queryset с выборкой только того, что выводит serializer"""
+    select, prefetch, only = get_optimizations(serializer, queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset.only(*only, *required)
+
+
+class QuerysetOptimizationMixin:
+    """Оптимизирует queryset вьюсета по сериализатору действия"""
+
+    optimized_actions = ("list", "retrieve")
+
+    def get_queryset(self):
+        return self.optimize_queryset(super().get_queryset())
+
+    def optimize_queryset(self, queryset):
+        if self.action not in self.optimized_actions:
+            return queryset
+        return optimize_queryset(queryset, self.get_serializer())
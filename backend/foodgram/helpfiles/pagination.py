@@ -0,0 +1,27 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from helpfiles import constants
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator админки для больших таблиц.
+
+    На PostgreSQL число строк берётся из оценки планировщика, точный
+    COUNT выполняется только для выборок меньше
+    ADMIN_EXACT_COUNT_LIMIT."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return super().count
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            estimate = int(cursor.fetchone()[0][0]["Plan"]["Plan Rows"])
+        if estimate < constants.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
@@ -0,0 +1,87 @@
+import datetime
+import decimal
+import uuid
+
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from django.utils.timezone import is_aware
+
+import orjson
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def default(obj):
+    """То же преобразование типов, что и в encoders.JSONEncoder DRF"""
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.datetime):
+        representation = obj.isoformat()
+        if representation.endswith("+00:00"):
+            representation = representation[:-6] + "Z"
+        return representation
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, datetime.time):
+        if is_aware(obj):
+            raise ValueError("Время с часовым поясом не сериализуется")
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__getitem__"):
+        cls = list if isinstance(obj, (list, tuple)) else dict
+        try:
+            return cls(obj)
+        except Exception:
+            pass
+    elif hasattr(obj, "__iter__"):
+        return tuple(obj)
+    raise TypeError(f"Объект типа {type(obj).__name__} не сериализуется")
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer на orjson с тем же выводом, что и у DRF. Ответы с
+    отступами (browsable API, ?indent=) строит сам DRF: orjson умеет
+    только отступ в 2 пробела и с другими разделителями"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        content = orjson.dumps(data, default=default, option=OPTIONS)
+        # Как и DRF, экранируем разделители строк для встраивания в JS.
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class ORJSONParser(parsers.JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+def is_plain_json(request):
+    """Ответ DRF-запроса - JSON ORJSONRenderer без отступов"""
+    renderer = request.accepted_renderer
+    return isinstance(renderer, ORJSONRenderer) and not (
+        renderer.get_indent(request.accepted_media_type, {})
+    )
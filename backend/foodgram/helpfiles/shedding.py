@@ -0,0 +1,118 @@
+"""
+Сброс избыточной нагрузки на дорогие эндпоинты.
+
+Группы эндпоинтов из LOAD_SHEDDING (регулярное выражение path и, если
+задан, список методов methods) ограничивают число одновременно
+обрабатываемых запросов на сервере. Слоты - файлы в
+LOAD_SHEDDING_DIR с неблокирующей блокировкой flock: она общая для
+воркеров и потоков и снимается сама при падении процесса. Запрос без
+свободного слота сразу получает 503, не занимая воркер и соединение с
+БД в очереди.
+"""
+import fcntl
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from helpfiles import metrics
+
+
+class ConcurrencyLimit:
+    """Не более limit одновременных владельцев слотов группы name"""
+
+    def __init__(self, name, limit, directory):
+        self.name = name
+        self.limit = limit
+        self.directory = Path(directory)
+
+    def acquire(self):
+        """Дескриптор занятого слота или None, если свободных нет"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for slot in range(self.limit):
+            fd = os.open(
+                self.directory / f"{self.name}.{slot}",
+                os.O_RDWR | os.O_CREAT,
+            )
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    def release(self, fd):
+        # Закрытие дескриптора снимает блокировку.
+        os.close(fd)
+
+
+class LoadSheddingMiddleware:
+    """Отвечает 503 на запросы к группе эндпоинтов, все слоты которой
+    заняты"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.groups = [
+            (
+                re.compile(group["path"]),
+                group.get("methods"),
+                ConcurrencyLimit(
+                    name, group["limit"], settings.LOAD_SHEDDING_DIR
+                ),
+            )
+            for name, group in settings.LOAD_SHEDDING.items()
+        ]
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        limit = self.get_limit(request)
+        if limit is None:
+            return self.get_response(request)
+        fd = limit.acquire()
+        if fd is None:
+            return self.shed(limit)
+        try:
+            return self.get_response(request)
+        finally:
+            limit.release(fd)
+
+    async def __acall__(self, request):
+        limit = self.get_limit(request)
+        if limit is None:
+            return await self.get_response(request)
+        fd = limit.acquire()
+        if fd is None:
+            return self.shed(limit)
+        try:
+            return await self.get_response(request)
+        finally:
+            limit.release(fd)
+
+    def get_limit(self, request):
+        for pattern, methods, limit in self.groups:
+            if pattern.match(request.path_info) and (
+                methods is None or request.method in methods
+            ):
+                return limit
+        return None
+
+    def shed(self, limit):
+        metrics.increment(f"shed.{limit.name}")
+        response = JsonResponse(
+            {"detail": "Сервер перегружен, повторите позже."},
+            status=503,
+            json_dumps_params={"ensure_ascii": False},
+        )
+        response["Retry-After"] = "1"
+        return response
@@ -0,0 +1,75 @@
+"""
+Ограничение частоты запросов к дорогим эндпоинтам алгоритмом token
+bucket.
+
+Частота "N/период" из DEFAULT_THROTTLE_RATES означает корзину на N
+запросов, которая пополняется равномерно за период: клиент может
+сделать N запросов подряд, а затем - по одному по мере пополнения.
+Области задаются во вьюсете атрибутом throttle_scope или словарём
+throttle_scopes по действиям. Состояние корзин хранится в кэше
+THROTTLE_CACHE: файловый кэш общий для всех воркеров gunicorn на
+сервере и не требует внешних сервисов.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class TokenBucketThrottle(ScopedRateThrottle):
+    """Корзина на пользователя, для анонимов - на IP-адрес"""
+
+    @property
+    def cache(self):
+        # Кэш выбирается при каждом запросе: команды, повторяющие запросы
+        # к API, подменяют THROTTLE_CACHE временным.
+        return caches[settings.THROTTLE_CACHE]
+
+    def get_scope(self, view):
+        scopes = getattr(view, "throttle_scopes", {})
+        return scopes.get(getattr(view, "action", None)) or getattr(
+            view, self.scope_attr, None
+        )
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(view)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        now = self.timer()
+        tokens, updated = self.cache.get(self.key, (self.num_requests, now))
+        # Чтение и запись не атомарны: при гонке воркеров лишний запрос
+        # может пройти, что для ограничения частоты допустимо.
+        tokens = min(
+            self.num_requests,
+            tokens + (now - updated) * self.num_requests / self.duration,
+        )
+        if tokens < 1:
+            self.wait_time = (1 - tokens) * self.duration / self.num_requests
+            return False
+        self.cache.set(self.key, (tokens - 1, now), self.duration)
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Корзина на IP-адрес независимо от пользователя; частота берётся
+    из области с суффиксом _ip"""
+
+    cache_format = "throttle_ip_%(scope)s_%(ident)s"
+
+    def get_scope(self, view):
+        scope = super().get_scope(view)
+        return f"{scope}_ip" if scope else None
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
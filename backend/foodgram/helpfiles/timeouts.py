@@ -0,0 +1,108 @@
+"""
+Ограничение времени SQL-запросов представления.
+
+Перед первым запросом представления к каждой БД PostgreSQL обёртка
+execute_wrapper устанавливает statement_timeout из STATEMENT_TIMEOUTS,
+а после представления сбрасывает его: постоянное соединение или
+соединение из пула переиспользуется следующими запросами. Прерванный по
+таймауту запрос превращается в ответ 503 и учитывается в метриках.
+"""
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, connections
+
+from helpfiles import metrics
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# SQLSTATE query_canceled: запрос прерван по statement_timeout.
+QUERY_CANCELED = "57014"
+
+
+class StatementTimeoutExceeded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Запрос выполнялся слишком долго, повторите позже."
+    default_code = "statement_timeout"
+
+
+def is_statement_timeout(exc):
+    return isinstance(exc, OperationalError) and (
+        getattr(exc.__cause__, "sqlstate", None) == QUERY_CANCELED
+    )
+
+
+class StatementTimeout:
+    """Обёртка execute_wrapper, устанавливающая statement_timeout"""
+
+    def __init__(self, timeout):
+        self.timeout = int(timeout)
+        self.aliases = []
+
+    def __call__(self, execute, sql, params, many, context):
+        connection = context["connection"]
+        if (
+            connection.vendor == "postgresql"
+            and connection.alias not in self.aliases
+        ):
+            # Запрос ниже снова проходит через обёртку, поэтому отметка
+            # ставится до него.
+            self.aliases.append(connection.alias)
+            with connection.cursor() as cursor:
+                cursor.execute("SET statement_timeout = %d" % self.timeout)
+        return execute(sql, params, many, context)
+
+    def reset(self):
+        for alias in self.aliases:
+            connection = connections[alias]
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("RESET statement_timeout")
+            except DatabaseError:
+                # Соединение уже непригодно и будет закрыто.
+                pass
+
+
+@contextmanager
+def statement_timeout(timeout):
+    wrapper = StatementTimeout(timeout)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            yield
+    finally:
+        wrapper.reset()
+
+
+class StatementTimeoutMixin:
+    """Ограничивает время запросов к БД действий вьюсета. Области
+    задаются словарём statement_timeout_scopes по действиям, остальные
+    действия получают область default. Примесь указывается раньше
+    NonAtomicReadsMixin, чтобы сброс шёл после завершения транзакции"""
+
+    statement_timeout_scopes = {}
+
+    def get_statement_timeout_scope(self, request):
+        action = self.action_map.get(request.method.lower())
+        return self.statement_timeout_scopes.get(action, "default")
+
+    def dispatch(self, request, *args, **kwargs):
+        self.statement_timeout_scope = self.get_statement_timeout_scope(
+            request
+        )
+        timeout = settings.STATEMENT_TIMEOUTS.get(
+            self.statement_timeout_scope
+        )
+        if not timeout:
+            return super().dispatch(request, *args, **kwargs)
+        with statement_timeout(timeout):
+            return super().dispatch(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if is_statement_timeout(exc):
+            metrics.increment(
+                f"statement_timeout.{self.statement_timeout_scope}"
+            )
+            exc = StatementTimeoutExceeded()
+        return super().handle_exception(exc)
@@ -0,0 +1,54 @@
+import json
+
+from django.contrib import admin
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "created",
+        "method",
+        "path",
+        "status_code",
+        "duration",
+        "query_count",
+        "query_duration",
+        "user",
+    )
+    list_display_links = ("created", "path")
+    list_filter = ("method", "status_code")
+    list_select_related = ("user",)
+    search_fields = ("path",)
+    fields = (
+        "created",
+        "user",
+        "method",
+        "path",
+        "status_code",
+        "duration",
+        "query_count",
+        "query_duration",
+        "formatted_stats",
+        "formatted_queries",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Профиль cProfile")
+    def formatted_stats(self, obj):
+        return format_html("<pre>{}</pre>", obj.stats)
+
+    @admin.display(description="SQL-запросы")
+    def formatted_queries(self, obj):
+        return format_html(
+            "<pre>{}</pre>",
+            json.dumps(obj.queries, ensure_ascii=False, indent=2),
+        )
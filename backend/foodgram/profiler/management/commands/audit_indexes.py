@@ -0,0 +1,248 @@
+import re
+from contextlib import ExitStack
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+from profiler.middleware import QueryCollector
+from profiler.replay import isolated_replay
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+FILTER_COLUMN_RE = re.compile(
+    r"\(*(?:\w+\.)?\"?(\w+)\"?\)?\s*(?:=|<>|<=|>=|<|>|~~\*?)\s"
+)
+SORT_KEY_RE = re.compile(r"(?:\w+\.)?\"?(\w+)\"?(\s+DESC)?")
+
+
+class AliasCollector(QueryCollector):
+    """QueryCollector, запоминающий соединение запроса"""
+
+    def __init__(self, alias, queries):
+        self.alias = alias
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        try:
+            return super().__call__(execute, sql, params, many, context)
+        finally:
+            self.queries[-1]["alias"] = self.alias
+
+
+class Command(BaseCommand):
+    """Команда для поиска недостающих индексов по запросам эндпоинтов"""
+
+    help = (
+        "replay the API read endpoints, run EXPLAIN (ANALYZE, BUFFERS) on "
+        "their queries, flag sequential scans and sorts and propose "
+        "composite indexes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=str, help="почта пользователя для запросов"
+        )
+        parser.add_argument("--host", type=str, default="localhost")
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=0,
+            help="не отмечать узлы, прочитавшие меньше строк",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("pk")
+        if options["user"]:
+            users = users.filter(email=options["user"])
+        user = users.first()
+        if user is None:
+            raise CommandError("Нет пользователя для запросов")
+        client = APIClient(HTTP_HOST=options["host"])
+        client.force_authenticate(user)
+        self.min_rows = options["min_rows"]
+        self.proposals = {}
+        with isolated_replay():
+            for path in self.get_endpoints():
+                self.audit(client, path)
+        self.report()
+
+    def get_endpoints(self):
+        endpoints = [
+            "/api/recipes/",
+            "/api/recipes/?is_favorited=1",
+            "/api/recipes/?is_in_shopping_cart=1",
+            "/api/recipes/popular/",
+            "/api/recipes/download_shopping_cart/",
+            "/api/tags/",
+            "/api/users/",
+            "/api/users/me/",
+            "/api/users/subscriptions/",
+        ]
+        recipe = Recipe.objects.order_by("pk").first()
+        if recipe is not None:
+            endpoints += [
+                f"/api/recipes/{recipe.pk}/",
+                f"/api/recipes/{recipe.pk}/similar/",
+                f"/api/recipes/?author={recipe.author_id}",
+                f"/api/users/{recipe.author_id}/",
+            ]
+        tag = Tag.objects.order_by("pk").first()
+        if tag is not None:
+            endpoints.append(f"/api/recipes/?tags={tag.slug}")
+        ingredient = Ingredient.objects.order_by("pk").first()
+        if ingredient is not None:
+            endpoints.append(f"/api/ingredients/?name={ingredient.name[:2]}")
+        return endpoints
+
+    def audit(self, client, path):
+        queries = []
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(
+                        AliasCollector(connection.alias, queries)
+                    )
+                )
+            response = client.get(path)
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"{path}: {response.status_code}, запросов: {len(queries)}"
+            )
+        )
+        for query in queries:
+            if query["many"] or not query["sql"].lstrip().upper().startswith(
+                "SELECT"
+            ):
+                continue
+            for finding in self.explain(query):
+                self.stdout.write(f"  {finding}")
+                self.stdout.write(f"    {query['sql'][:200]}")
+
+    def explain(self, query):
+        connection = connections[query["alias"]]
+        if connection.vendor != "postgresql":
+            return self.explain_plain(connection, query)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query["sql"],
+                    query["params"],
+                )
+                plan = cursor.fetchone()[0][0]["Plan"]
+        except DatabaseError as error:
+            return [f"EXPLAIN не выполнен: {error}"]
+        return list(self.walk(plan))
+
+    def explain_plain(self, connection, query):
+        """Без PostgreSQL - только отметки по текстовому плану"""
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {query['sql']}", query["params"])
+            lines = [
+                " ".join(str(column) for column in row)
+                for row in cursor.fetchall()
+            ]
+        return [
+            line
+            for line in lines
+            if re.search(r"\bSCAN\b|TEMP B-TREE|Seq Scan|Sort", line)
+        ]
+
+    def walk(self, node):
+        """Находки по узлам плана: последовательные чтения и сортировки"""
+        rows = node.get("Actual Rows", 0) + node.get(
+            "Rows Removed by Filter", 0
+        )
+        node_type = node["Node Type"]
+        if node_type == "Seq Scan" and rows >= self.min_rows:
+            columns = self.get_filter_columns(node.get("Filter", ""))
+            yield (
+                f"Seq Scan {node['Relation Name']}: прочитано {rows}, "
+                f"отброшено {node.get('Rows Removed by Filter', 0)}, "
+                f"буферов {node.get('Shared Hit Blocks', 0)}"
+                f"+{node.get('Shared Read Blocks', 0)}"
+            )
+            if columns:
+                yield self.propose(node["Relation Name"], columns)
+        elif node_type in ("Sort", "Incremental Sort") and (
+            rows >= self.min_rows
+        ):
+            relation = self.get_relation(node)
+            columns = [
+                ("-" if match[2] else "") + match[1]
+                for match in (
+                    SORT_KEY_RE.match(key) for key in node.get("Sort Key", ())
+                )
+                if match
+            ]
+            yield (
+                f"{node_type} {relation}: {', '.join(node['Sort Key'])}, "
+                f"метод {node.get('Sort Method', '?')}"
+            )
+            if relation and columns:
+                yield self.propose(relation, columns)
+        for child in node.get("Plans", ()):
+            yield from self.walk(child)
+
+    def get_filter_columns(self, condition):
+        return list(dict.fromkeys(FILTER_COLUMN_RE.findall(condition)))
+
+    def get_relation(self, node):
+        if "Relation Name" in node:
+            return node["Relation Name"]
+        for child in node.get("Plans", ()):
+            relation = self.get_relation(child)
+            if relation:
+                return relation
+        return None
+
+    def propose(self, table, columns):
+        """Индекс по столбцам или отметка, что подходящий уже есть"""
+        model = {
+            model._meta.db_table: model for model in apps.get_models()
+        }.get(table)
+        names = [column.lstrip("-") for column in columns]
+        existing = self.get_index(table, names)
+        if existing:
+            return f"-> есть индекс {existing}, план выбран по статистике"
+        fields = columns
+        if model is not None:
+            by_column = {
+                field.column: field.name
+                for field in model._meta.concrete_fields
+            }
+            fields = [
+                ("-" if column.startswith("-") else "")
+                + by_column.get(column.lstrip("-"), column.lstrip("-"))
+                for column in columns
+            ]
+        label = model._meta.label if model is not None else table
+        proposal = f"{label}: models.Index(fields={fields!r})"
+        self.proposals[proposal] = self.proposals.get(proposal, 0) + 1
+        return f"-> {proposal}"
+
+    def get_index(self, table, columns):
+        connection = connections["default"]
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, table
+            )
+        for name, constraint in constraints.items():
+            if constraint["index"] or constraint["unique"]:
+                if constraint["columns"][: len(columns)] == columns:
+                    return name
+        return None
+
+    def report(self):
+        if not self.proposals:
+            self.stdout.write(self.style.SUCCESS("Новых индексов не нужно"))
+            return
+        self.stdout.write(self.style.WARNING("Предлагаемые индексы:"))
+        for proposal, count in sorted(
+            self.proposals.items(), key=lambda item: -item[1]
+        ):
+            self.stdout.write(f"  {proposal}  # запросов: {count}")
@@ -0,0 +1,98 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+SCENARIOS = {
+    "direct": {
+        "ENGINE": "django.db.backends.postgresql",
+        "CONN_MAX_AGE": 0,
+    },
+    "persistent": {
+        "ENGINE": "django.db.backends.postgresql",
+        "CONN_MAX_AGE": 600,
+    },
+    "pool": {
+        "ENGINE": "foodgram.postgresql_pool",
+        "CONN_MAX_AGE": 0,
+    },
+}
+
+
+class Command(BaseCommand):
+    """Команда для замера накладных расходов на соединение с БД"""
+
+    help = (
+        "compare new connection per request, persistent connections and "
+        "the psycopg pool under concurrent load"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=SCENARIOS,
+            help="сценарий для замера, по умолчанию все",
+        )
+
+    def handle(self, *args, **options):
+        for name in options["scenario"] or SCENARIOS:
+            alias = f"bench_{name}"
+            connections.settings[alias] = {
+                **connections.settings["default"],
+                **SCENARIOS[name],
+                "ATOMIC_REQUESTS": False,
+            }
+            self.run_scenario(
+                name, alias, options["threads"], options["requests"]
+            )
+
+    def run_scenario(self, name, alias, threads, requests):
+        opened = []
+
+        def on_connection_created(sender, connection, **kwargs):
+            if connection.alias == alias:
+                opened.append(connection.alias)
+
+        def worker(_):
+            connection = connections[alias]
+            timings = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                # То же, что делает Django по сигналу request_finished.
+                connection.close_if_unusable_or_obsolete()
+                timings.append(time.perf_counter() - start)
+            connection.close()
+            return timings
+
+        connection_created.connect(on_connection_created)
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                timings = [
+                    timing
+                    for result in executor.map(worker, range(threads))
+                    for timing in result
+                ]
+        finally:
+            connection_created.disconnect(on_connection_created)
+        elapsed = time.perf_counter() - start
+        pool = getattr(connections[alias], "pool", None)
+        if pool is not None:
+            # Django считает каждую выдачу из пула новым соединением.
+            opened = range(pool.get_stats()["connections_num"])
+        timings.sort()
+        self.stdout.write(
+            f"{name:>10}: {len(timings) / elapsed:8.0f} req/s, "
+            f"p50 {statistics.median(timings) * 1000:6.2f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1000:6.2f} ms, "
+            f"соединений открыто: {len(opened)}"
+        )
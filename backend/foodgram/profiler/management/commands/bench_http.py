@@ -0,0 +1,62 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Команда для нагрузочного замера запущенного сервера"""
+
+    help = (
+        "send concurrent GET requests to a running server, e.g. to compare "
+        "the WSGI and ASGI deployments"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", nargs="+", type=str)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument(
+            "--header",
+            action="append",
+            default=[],
+            help="дополнительный заголовок вида 'Name: value'",
+        )
+
+    def handle(self, *args, **options):
+        headers = {}
+        for header in options["header"]:
+            name, value = header.split(":", 1)
+            headers[name.strip()] = value.strip()
+        for url in options["url"]:
+            self.run(
+                url, headers, options["concurrency"], options["requests"]
+            )
+
+    def run(self, url, headers, concurrency, requests):
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers)) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as error:
+                status = error.code
+            return status, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, range(requests)))
+        elapsed = time.perf_counter() - start
+        timings = sorted(timing for _, timing in results)
+        errors = sum(status >= 400 for status, _ in results)
+        self.stdout.write(
+            f"{url}: {requests / elapsed:8.1f} req/s, "
+            f"p50 {statistics.median(timings) * 1000:7.2f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1000:7.2f} ms, "
+            f"p99 {timings[int(len(timings) * 0.99)] * 1000:7.2f} ms, "
+            f"ошибок: {errors}"
+        )
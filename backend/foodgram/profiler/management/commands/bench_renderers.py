@@ -0,0 +1,59 @@
+import timeit
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+
+from helpfiles.renderers import ORJSONRenderer
+from recipes.models import Ingredient
+from recipes.serializers import IngredientSerializer, RecipeReadSerializer
+from recipes.views import RecipeViewSet
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+
+class Command(BaseCommand):
+    """Команда для сравнения скорости JSON-рендереров"""
+
+    help = (
+        "compare the stock DRF JSONRenderer with the orjson renderer on "
+        "the recipe list and ingredient catalog payloads"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=6)
+        parser.add_argument("--repeat", type=int, default=200)
+        parser.add_argument("--host", type=str, default="localhost")
+
+    def handle(self, *args, **options):
+        request = Request(
+            APIRequestFactory().get("/api/recipes/", HTTP_HOST=options["host"])
+        )
+        request.user = AnonymousUser()
+        view = RecipeViewSet(request=request, action="list")
+        recipes = view.get_queryset()[: options["recipes"]]
+        payloads = {
+            "recipes": RecipeReadSerializer(
+                recipes, many=True, context={"request": request}
+            ).data,
+            "ingredients": IngredientSerializer(
+                Ingredient.objects.select_related("measurement_unit"),
+                many=True,
+            ).data,
+        }
+        for name, data in payloads.items():
+            self.run(name, data, options["repeat"])
+
+    def run(self, name, data, repeat):
+        stock, fast = JSONRenderer(), ORJSONRenderer()
+        content = fast.render(data)
+        if content != stock.render(data):
+            self.stderr.write(f"{name}: вывод рендереров различается")
+        stock_time = timeit.timeit(lambda: stock.render(data), number=repeat)
+        fast_time = timeit.timeit(lambda: fast.render(data), number=repeat)
+        self.stdout.write(
+            f"{name}: {len(content)} байт, "
+            f"JSONRenderer {stock_time / repeat * 1000:7.3f} ms, "
+            f"ORJSONRenderer {fast_time / repeat * 1000:7.3f} ms, "
+            f"ускорение x{stock_time / fast_time:.1f}"
+        )
@@ -0,0 +1,130 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+
+from helpfiles.optimizer import optimize_queryset
+from helpfiles.renderers import ORJSONRenderer
+from recipes.fast_serializers import serialize_recipes
+from recipes.models import count_recipes
+from recipes.serializers import RecipeReadSerializer
+from recipes.views import RecipeViewSet
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.fast_serializers import USER_FIELDS, serialize_subscriptions
+from users.serializers import UserWithRecipeSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Команда для проверки и замера быстрых сериализаторов"""
+
+    help = (
+        "check that the fast-path serializers render byte-for-byte the "
+        "same JSON as the DRF serializers and compare CPU time per page"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            default=[],
+            help="почта пользователя; без параметра - первые пользователи",
+        )
+        parser.add_argument("--limit", type=int, default=6)
+        parser.add_argument("--recipes-limit", type=str, default="3")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--host", type=str, default="localhost")
+
+    def handle(self, *args, **options):
+        if options["user"]:
+            users = list(User.objects.filter(email__in=options["user"]))
+        else:
+            users = list(User.objects.all()[:3])
+        self.options = options
+        self.renderer = ORJSONRenderer()
+        self.mismatches = 0
+        for user in [AnonymousUser(), *users]:
+            request = self.get_request(user)
+            self.check_recipes(request)
+            if user.is_authenticated:
+                self.check_subscriptions(request)
+        if self.mismatches:
+            raise CommandError(f"Расхождений с DRF: {self.mismatches}")
+
+    def get_request(self, user):
+        request = Request(
+            APIRequestFactory().get(
+                "/api/recipes/",
+                {"recipes_limit": self.options["recipes_limit"]},
+                HTTP_HOST=self.options["host"],
+            )
+        )
+        request.user = user
+        return request
+
+    def check_recipes(self, request):
+        view = RecipeViewSet(request=request, action="list")
+        queryset = view.get_queryset()
+        rows = list(
+            view.get_validators_queryset(queryset)[: self.options["limit"]]
+        )
+
+        def stock():
+            serializer = RecipeReadSerializer(context={"request": request})
+            recipes = {
+                recipe.pk: recipe
+                for recipe in optimize_queryset(
+                    queryset.filter(pk__in=[row[0] for row in rows]),
+                    serializer,
+                )
+            }
+            return [
+                serializer.to_representation(recipes[row[0]])
+                for row in rows
+                if row[0] in recipes
+            ]
+
+        self.compare(
+            f"recipes ({request.user})",
+            stock,
+            lambda: serialize_recipes(rows, request),
+        )
+
+    def check_subscriptions(self, request):
+        queryset = (
+            request.user.subscriptions.all()
+            .annotate(recipes_count=count_recipes())[: self.options["limit"]]
+        )
+        rows = list(queryset.values_list(*USER_FIELDS))
+        self.compare(
+            f"subscriptions ({request.user})",
+            lambda: UserWithRecipeSerializer(
+                queryset.prefetch_related("recipes"),
+                many=True,
+                context={"request": request},
+            ).data,
+            lambda: serialize_subscriptions(rows, request),
+        )
+
+    def compare(self, name, stock, fast):
+        if self.renderer.render(stock()) != self.renderer.render(fast()):
+            self.mismatches += 1
+            self.stderr.write(f"{name}: вывод различается")
+            return
+        repeat = self.options["repeat"]
+        timings = [self.measure(stock, repeat), self.measure(fast, repeat)]
+        self.stdout.write(
+            f"{name}: DRF {timings[0]:7.3f} ms/стр., "
+            f"быстрый путь {timings[1]:7.3f} ms/стр., "
+            f"ускорение x{timings[0] / timings[1]:.1f}"
+        )
+
+    def measure(self, serialize, repeat):
+        """Процессорное время на страницу, включая запросы к БД"""
+        start = time.process_time()
+        for _ in range(repeat):
+            self.renderer.render(serialize())
+        return (time.process_time() - start) / repeat * 1000
@@ -0,0 +1,135 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном интерпретаторе: загрузка WSGI-приложения и
+# первый запрос так же, как в новом воркере gunicorn.
+STARTUP_SCRIPT = """
+import json
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+ready = time.time()
+environ = {"PATH_INFO": sys.argv[1], "HTTP_HOST": sys.argv[2]}
+setup_testing_defaults(environ)
+statuses = []
+body = application(environ, lambda status, headers: statuses.append(status))
+b"".join(body)
+body.close()
+print(json.dumps({
+    "ready": ready,
+    "response": time.time(),
+    "status": statuses[0],
+}))
+"""
+
+
+class Command(BaseCommand):
+    """Команда для замера времени холодного запуска приложения"""
+
+    help = (
+        "start a fresh interpreter with -X importtime, load the WSGI "
+        "application and serve the first request; report time to ready, "
+        "time to first response and the slowest imports"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", type=str, default="/api/tags/")
+        parser.add_argument("--host", type=str, default="localhost")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=15,
+            help="сколько самых долгих импортов верхнего уровня показать",
+        )
+        parser.add_argument(
+            "--budget",
+            type=float,
+            help="ошибка, если медиана до первого ответа больше, мс",
+        )
+
+    def handle(self, *args, **options):
+        ready, response = [], []
+        for _ in range(options["repeat"]):
+            timings, imports = self.run(options["path"], options["host"])
+            ready.append(timings["ready"])
+            response.append(timings["response"])
+        self.stdout.write(
+            f"готовность: медиана {statistics.median(ready):8.1f} ms, "
+            f"максимум {max(ready):8.1f} ms"
+        )
+        self.stdout.write(
+            f"первый ответ ({timings['status']}): медиана "
+            f"{statistics.median(response):8.1f} ms, "
+            f"максимум {max(response):8.1f} ms"
+        )
+        self.stdout.write(
+            f"импорт: {sum(imports.values()) / 1000:8.1f} ms, "
+            "самые долгие пакеты:"
+        )
+        for name, cumulative in sorted(
+            imports.items(), key=lambda item: item[1], reverse=True
+        )[: options["top"]]:
+            self.stdout.write(f"{cumulative / 1000:8.1f} ms  {name}")
+        if (
+            options["budget"] is not None
+            and statistics.median(response) > options["budget"]
+        ):
+            raise CommandError(
+                f"Первый ответ дольше бюджета {options['budget']} ms"
+            )
+
+    def run(self, path, host):
+        """Время до готовности и до первого ответа в мс и время импорта
+        модулей верхнего уровня в мкс"""
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get(
+                "DJANGO_SETTINGS_MODULE", "foodgram.settings"
+            ),
+        }
+        start = time.time()
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                STARTUP_SCRIPT,
+                path,
+                host,
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(process.stderr[-2000:])
+        result = json.loads(process.stdout.splitlines()[-1])
+        imports = {}
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            _, cumulative, name = line.split("|")
+            # Вложенные импорты с отступом уже учтены в строке модуля
+            # верхнего уровня; первая строка - заголовок таблицы.
+            if name[1:].startswith(" ") or not cumulative.strip().isdigit():
+                continue
+            imports[name.strip()] = int(cumulative)
+        return {
+            "ready": (result["ready"] - start) * 1000,
+            "response": (result["response"] - start) * 1000,
+            "status": result["status"],
+        }, imports
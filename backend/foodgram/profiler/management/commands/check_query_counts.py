@@ -0,0 +1,269 @@
+from contextlib import ExitStack
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from profiler.middleware import QueryCollector
+from profiler.replay import isolated_replay
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+# Точки сохранения открывает ATOMIC_REQUESTS внутри транзакции команды;
+# в обычном запросе их нет. SET и RESET statement_timeout не обращаются к
+# данным.
+SKIPPED_STATEMENTS = (
+    "SAVEPOINT",
+    "RELEASE SAVEPOINT",
+    "ROLLBACK TO",
+    "SET STATEMENT_TIMEOUT",
+    "RESET STATEMENT_TIMEOUT",
+)
+
+
+class Command(BaseCommand):
+    """Команда для проверки числа запросов к БД по действиям API"""
+
+    help = (
+        "replay every API action, fail if it runs more queries than its "
+        "budget or if the number of queries grows with the page size"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=str, help="почта пользователя для запросов"
+        )
+        parser.add_argument("--host", type=str, default="localhost")
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=10,
+            help="размер страницы для сравнения со страницей из одной записи",
+        )
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.order_by("pk").first()
+        tag = Tag.objects.order_by("pk").first()
+        ingredient = Ingredient.objects.order_by("pk").first()
+        users = User.objects.order_by("pk")
+        if options["user"]:
+            users = users.filter(email=options["user"])
+        user = users.first()
+        if None in (recipe, tag, ingredient, user):
+            raise CommandError("Нужны пользователь, рецепт, тег и ингредиент")
+        self.host = options["host"]
+        self.page_size = options["page_size"]
+        self.failures = 0
+        with isolated_replay():
+            for name, budget, client, method, path, data, paginated in (
+                self.get_actions(user, recipe, tag, ingredient)
+            ):
+                self.check_action(
+                    name, budget, client, method, path, data, paginated
+                )
+        if self.failures:
+            raise CommandError(f"Превышений: {self.failures}")
+
+    def get_client(self, user):
+        client = APIClient(HTTP_HOST=self.host)
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    def get_actions(self, user, recipe, tag, ingredient):
+        """(действие, бюджет, клиент, метод, путь, данные, постраничное)"""
+        anonymous = self.get_client(None)
+        reader = self.get_client(user)
+        author = self.get_client(recipe.author)
+        recipe_data = {
+            "name": recipe.name,
+            "text": recipe.text,
+            "cooking_time": recipe.cooking_time,
+            "tags": list(recipe.tags.values_list("pk", flat=True)),
+            "ingredients": [
+                {"id": ingredient_id, "amount": amount}
+                for ingredient_id, amount in recipe.recipes.values_list(
+                    "ingredient_id", "amount"
+                )
+            ],
+        }
+        actions = [
+            ("recipes list", 3, reader, "get", "/api/recipes/", None, True),
+            (
+                "recipes list (anonymous)",
+                3,
+                anonymous,
+                "get",
+                "/api/recipes/",
+                None,
+                True,
+            ),
+            (
+                "recipes popular",
+                3,
+                reader,
+                "get",
+                "/api/recipes/popular/",
+                None,
+                True,
+            ),
+            (
+                "recipes retrieve",
+                2,
+                reader,
+                "get",
+                f"/api/recipes/{recipe.pk}/",
+                None,
+                False,
+            ),
+            (
+                "recipes similar",
+                3,
+                reader,
+                "get",
+                f"/api/recipes/{recipe.pk}/similar/",
+                None,
+                False,
+            ),
+            (
+                "recipes partial_update",
+                # Теги и ингредиенты проверяются по одному; карточка
+                # пересобирается четырьмя запросами.
+                16
+                + len(recipe_data["tags"])
+                + 2 * len(recipe_data["ingredients"]),
+                author,
+                "patch",
+                f"/api/recipes/{recipe.pk}/",
+                recipe_data,
+                False,
+            ),
+            (
+                "recipes download_shopping_cart",
+                1,
+                reader,
+                "get",
+                "/api/recipes/download_shopping_cart/",
+                None,
+                False,
+            ),
+            ("tags list", 1, anonymous, "get", "/api/tags/", None, False),
+            (
+                "tags retrieve",
+                1,
+                anonymous,
+                "get",
+                f"/api/tags/{tag.pk}/",
+                None,
+                False,
+            ),
+            (
+                "ingredients list",
+                1,
+                anonymous,
+                "get",
+                "/api/ingredients/",
+                None,
+                False,
+            ),
+            (
+                "ingredients search",
+                1,
+                anonymous,
+                "get",
+                f"/api/ingredients/?name={ingredient.name[:2]}",
+                None,
+                False,
+            ),
+            (
+                "ingredients retrieve",
+                1,
+                anonymous,
+                "get",
+                f"/api/ingredients/{ingredient.pk}/",
+                None,
+                False,
+            ),
+            ("users list", 2, reader, "get", "/api/users/", None, True),
+            (
+                "users retrieve",
+                2,
+                reader,
+                "get",
+                f"/api/users/{recipe.author_id}/",
+                None,
+                False,
+            ),
+            ("users me", 0, reader, "get", "/api/users/me/", None, False),
+            (
+                "users subscriptions",
+                3,
+                reader,
+                "get",
+                "/api/users/subscriptions/",
+                None,
+                True,
+            ),
+        ]
+        target = (
+            User.objects.exclude(pk=user.pk)
+            .exclude(users_subs__user=user)
+            .order_by("pk")
+            .first()
+        )
+        if target is not None:
+            actions.append(
+                (
+                    "users subscribe",
+                    8,
+                    reader,
+                    "post",
+                    f"/api/users/{target.pk}/subscribe/",
+                    None,
+                    False,
+                )
+            )
+        return actions
+
+    def check_action(
+        self, name, budget, client, method, path, data, paginated
+    ):
+        if paginated:
+            separator = "&" if "?" in path else "?"
+            counts = [
+                self.count(client, method, f"{path}{separator}limit={limit}")
+                for limit in (1, self.page_size)
+            ]
+        else:
+            counts = [self.count(client, method, path, data)]
+        line = f"{name}: {' / '.join(map(str, counts))} (бюджет {budget})"
+        if max(counts) > budget or len(set(counts)) > 1:
+            self.failures += 1
+            self.stderr.write(line)
+        else:
+            self.stdout.write(line)
+
+    def count(self, client, method, path, data=None):
+        """Число запросов действия; изменения данных откатываются"""
+        collector = QueryCollector()
+        with transaction.atomic():
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(collector)
+                    )
+                if data is None:
+                    response = getattr(client, method)(path)
+                else:
+                    response = getattr(client, method)(
+                        path, data, format="json"
+                    )
+            transaction.set_rollback(True)
+        if response.status_code >= 400:
+            raise CommandError(f"{path}: ответ {response.status_code}")
+        return sum(
+            not query["sql"].lstrip().upper().startswith(SKIPPED_STATEMENTS)
+            for query in collector.queries
+        )
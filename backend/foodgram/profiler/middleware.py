@@ -0,0 +1,171 @@
+import cProfile
+import io
+import pstats
+import time
+from contextlib import ExitStack
+
+from django.db import DatabaseError, connections
+
+from asgiref.sync import (
+    async_to_sync,
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async
+)
+from helpfiles import constants
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import RequestProfile
+
+
+class QueryCollector:
+    """Обёртка execute_wrapper, запоминающая SQL-запросы, их время и
+    базу данных"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "database": context["connection"].alias,
+                    "sql": sql,
+                    "params": params,
+                    "many": many,
+                    "duration": (time.perf_counter() - start) * 1000,
+                }
+            )
+
+
+class RequestProfilerMiddleware:
+    """Профилирует запрос сотрудника по заголовку X-Profile или
+    параметру ?profile=1 и сохраняет результат для просмотра в админке"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.is_requested(request):
+            return self.get_response(request)
+        user = self.get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        return self.profile(request, user, self.get_response)
+
+    async def __acall__(self, request):
+        if not self.is_requested(request):
+            return await self.get_response(request)
+        user = await sync_to_async(self.get_staff_user)(request)
+        if user is None:
+            return await self.get_response(request)
+        # Запрос профилируется в потоке для синхронного кода: туда же
+        # попадают обращения к БД асинхронных представлений.
+        return await sync_to_async(self.profile)(
+            request, user, async_to_sync(self.get_response)
+        )
+
+    def is_requested(self, request):
+        return bool(
+            request.headers.get(constants.PROFILER_HEADER)
+            or request.GET.get(constants.PROFILER_QUERY_PARAM)
+        )
+
+    def get_staff_user(self, request):
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            try:
+                user_auth = TokenAuthentication().authenticate(request)
+            except AuthenticationFailed:
+                return None
+            user = user_auth[0] if user_auth else None
+        if user is not None and user.is_staff:
+            return user
+        return None
+
+    def profile(self, request, user, get_response):
+        collector = QueryCollector()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        # Чтение может уйти в реплику, поэтому запросы собираются со всех
+        # баз данных.
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(collector)
+                )
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        duration = (time.perf_counter() - start) * 1000
+        queries = self.explain(collector.queries)
+        profile = RequestProfile.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path(),
+            status_code=response.status_code,
+            duration=duration,
+            query_count=len(queries),
+            query_duration=sum(query["duration"] for query in queries),
+            queries=queries,
+            stats=self.format_stats(profiler),
+        )
+        response["X-Profile-Id"] = str(profile.pk)
+        return response
+
+    def format_stats(self, profiler):
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE)
+        stats.print_stats(constants.PROFILER_STATS_LIMIT)
+        return stream.getvalue()
+
+    def explain(self, queries):
+        """Добавляет план выполнения к SELECT-запросам; EXPLAIN
+        выполняется в той же базе данных, что и запрос"""
+        result = []
+        for index, query in enumerate(queries):
+            item = {
+                "database": query["database"],
+                "sql": query["sql"],
+                "params": [str(param) for param in query["params"] or ()],
+                "duration": round(query["duration"], 3),
+            }
+            if (
+                index < constants.PROFILER_EXPLAIN_LIMIT
+                and not query["many"]
+                and query["sql"].lstrip().upper().startswith("SELECT")
+            ):
+                item["explain"] = self.get_plan(
+                    connections[query["database"]],
+                    query["sql"],
+                    query["params"],
+                )
+            result.append(item)
+        return result
+
+    def get_plan(self, connection, sql, params):
+        prefix = connection.ops.explain_query_prefix()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"{prefix} {sql}", params)
+                return "\n".join(
+                    " ".join(str(column) for column in row)
+                    for row in cursor.fetchall()
+                )
+        except DatabaseError as error:
+            return f"EXPLAIN не выполнен: {error}"
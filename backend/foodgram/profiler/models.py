@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+
+from helpfiles import constants
+from helpfiles.Basemodel import BaseModelMixin
+
+User = get_user_model()
+
+
+class RequestProfile(BaseModelMixin):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="request_profiles",
+        verbose_name="Пользователь",
+    )
+    method = models.CharField(
+        verbose_name="Метод",
+        max_length=constants.METHOD_MAX_LEN,
+    )
+    path = models.TextField(verbose_name="Адрес запроса")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Код ответа")
+    duration = models.FloatField(verbose_name="Длительность, мс")
+    query_count = models.PositiveIntegerField(verbose_name="Число запросов")
+    query_duration = models.FloatField(verbose_name="Время в БД, мс")
+    queries = models.JSONField(
+        verbose_name="SQL-запросы",
+        default=list,
+    )
+    stats = models.TextField(verbose_name="Профиль cProfile")
+
+    class Meta:
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+        ordering = ("-created", "id")
+
+    def __str__(self):
+        return f"{self.method} {self.path}"
@@ -0,0 +1,32 @@
+"""
+Изоляция команд, повторяющих запросы к API, от рабочих данных.
+
+audit_indexes и check_query_counts выполняют запросы от имени настоящих
+пользователей. Без подмены они расходовали бы их корзины ограничения
+частоты и оставляли файлы выгрузок списка покупок в EXPORTS_ROOT.
+"""
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+
+REPLAY_CACHE = "replay"
+
+
+@contextmanager
+def isolated_replay():
+    """Временные кэш корзин ограничения частоты и каталог выгрузок на
+    время повтора запросов"""
+    with tempfile.TemporaryDirectory() as exports, override_settings(
+        CACHES={
+            **settings.CACHES,
+            REPLAY_CACHE: {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": REPLAY_CACHE,
+            },
+        },
+        THROTTLE_CACHE=REPLAY_CACHE,
+        EXPORTS_ROOT=exports,
+    ):
+        yield
@@ -0,0 +1,13 @@
+from helpfiles.metrics import get_metrics
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class MetricsView(APIView):
+    """Счётчики таймаутов запросов к БД и сброшенных запросов"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        return Response(get_metrics())
@@ -1,6 +1,14 @@
 from django.contrib import admin
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
+from helpfiles.deletion import SoftDeleteAdminMixin
+from helpfiles.pagination import EstimatedCountPaginator
+
+from .cards import rebuild_cards
+from .deletion import soft_delete_recipes
 from .models import (
+    Favorite,
     Ingredient,
     IngredientsRecipes,
     MeasurementUnit,
@@ -18,30 +26,69 @@ class TagAdmin(admin.ModelAdmin):
 
 
 class IngredientAdmin(admin.ModelAdmin):
-    list_display = ("name",)
-    list_filter = ("name",)
-    search_fields = ("name",)
+    list_display = ("name", "measurement_unit")
+    list_filter = ("measurement_unit",)
+    list_select_related = ("measurement_unit",)
+    search_fields = ("^name",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class RecipesTagsInline(admin.TabularInline):
     model = RecipesTags
     extra = 0
+    autocomplete_fields = ("tags",)
 
 
 class IngredientsRecipesInline(admin.TabularInline):
     model = IngredientsRecipes
     extra = 0
+    autocomplete_fields = ("ingredient",)
 
 
-class RecipeAdmin(admin.ModelAdmin):
-    list_filter = ("name", "author", "tags")
-    search_fields = ("name", "text")
+class RecipeAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
+    list_filter = ("tags",)
+    search_fields = ("^name",)
     list_display = (
         "name",
         "author",
+        "favorites_count",
     )
     list_display_links = ("name",)
+    list_select_related = ("author",)
+    autocomplete_fields = ("author",)
     inlines = (IngredientsRecipesInline, RecipesTagsInline)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    soft_delete_func = staticmethod(soft_delete_recipes)
+
+    def get_queryset(self, request):
+        # Подзапрос считается только для строк текущей страницы.
+        favorites_count = (
+            Favorite.objects.filter(recipe=OuterRef("pk"))
+            .order_by()
+            .values("recipe")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                favorites_count=Coalesce(
+                    Subquery(favorites_count, output_field=IntegerField()),
+                    0,
+                )
+            )
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        rebuild_cards([form.instance.pk])
+
+    @admin.display(description="В избранном", ordering="favorites_count")
+    def favorites_count(self, obj):
+        return obj.favorites_count
 
 
 admin.site.register(MeasurementUnit)
@@ -0,0 +1,263 @@
+"""
+Асинхронные версии горячих эндпоинтов чтения для запуска под ASGI.
+
+Представления обрабатывают типовые запросы через асинхронный ORM и не
+занимают поток на время ожидания БД и медленного клиента. Всё остальное
+(запись, ошибки авторизации и валидации, browsable API, сортировка)
+передаётся исходным DRF-представлениям, поэтому ответы совпадают.
+"""
+from functools import wraps
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.http import HttpResponse
+from django.urls import resolve
+from django.utils.cache import patch_vary_headers
+
+from asgiref.sync import sync_to_async
+from helpfiles.conditional import (
+    get_not_modified_response,
+    latest,
+    make_etag,
+    set_validators
+)
+from helpfiles.db_routing import replica_reads
+from helpfiles.optimizer import optimize_queryset
+from helpfiles.renderers import ORJSONRenderer
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+from .catalogs import (
+    INGREDIENTS_CACHE_KEY,
+    TAGS_CACHE_KEY,
+    aget_catalog_response
+)
+from .fast_serializers import aserialize_recipes
+from .feed import aget_feed_entry, feed_response, get_feed_key
+from .filters import IngredientsSearchFilter, RecipeFilter
+from .models import Ingredient, Tag
+from .serializers import IngredientSerializer, TagSerializer
+from .views import IngredientViewSet, RecipeViewSet
+
+SYNC_URLCONF = "foodgram.urls"
+
+
+class Fallback(Exception):
+    """Запрос должно обработать исходное DRF-представление"""
+
+
+def async_read_view(view):
+    """Отдаёт GET асинхронному представлению, остальное - DRF"""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method == "GET" and uses_default_format(request):
+            try:
+                with replica_reads(request):
+                    return await view(request, *args, **kwargs)
+            except Fallback:
+                pass
+        match = resolve(request.path_info, urlconf=SYNC_URLCONF)
+        return await sync_to_async(match.func)(
+            request, *match.args, **match.kwargs
+        )
+
+    # csrf_exempt и non_atomic_requests в Django 4.2 не поддерживают
+    # корутины, поэтому атрибуты выставляются напрямую.
+    wrapper.csrf_exempt = True
+    wrapper._non_atomic_requests = {"default"}
+    return wrapper
+
+
+def uses_default_format(request):
+    """Запрос без ?format= и без text/html в Accept, то есть не к
+    browsable API. Проверяются сами заголовки: согласование формата DRF
+    к этому моменту ещё не выполнено"""
+    accept = request.headers.get("Accept", "")
+    return "format" not in request.GET and "text/html" not in accept
+
+
+async def authenticate(request):
+    """Асинхронный аналог TokenAuthentication для корректного токена"""
+    header = request.headers.get("Authorization", "").split()
+    if not header:
+        return AnonymousUser()
+    if len(header) != 2 or header[0] != "Token":
+        raise Fallback
+    try:
+        token = await Token.objects.select_related("user").aget(
+            key=header[1]
+        )
+    except Token.DoesNotExist:
+        raise Fallback
+    if not token.user.is_active:
+        raise Fallback
+    return token.user
+
+
+async def make_drf_request(request):
+    drf_request = Request(request)
+    drf_request.user = await authenticate(request)
+    return drf_request
+
+
+def render(data):
+    response = HttpResponse(
+        ORJSONRenderer().render(data), content_type="application/json"
+    )
+    response["Vary"] = "Accept"
+    return response
+
+
+async def catalog_response(key):
+    response = await aget_catalog_response(key)
+    response["Vary"] = "Accept"
+    return response
+
+
+async def paginate(drf_request, queryset):
+    """Повторяет FoodgramPaginator без синхронного count()"""
+    paginator = RecipeViewSet.pagination_class()
+    page_size = paginator.get_page_size(drf_request)
+    django_paginator = Paginator(queryset, page_size)
+    django_paginator.count = await queryset.acount()
+    number = drf_request.query_params.get(paginator.page_query_param) or 1
+    if number in paginator.last_page_strings:
+        number = django_paginator.num_pages
+    try:
+        number = django_paginator.validate_number(number)
+    except InvalidPage:
+        raise Fallback
+    bottom = (number - 1) * page_size
+    objects = [obj async for obj in queryset[bottom:bottom + page_size]]
+    paginator.page = Page(objects, number, django_paginator)
+    paginator.request = drf_request
+    return paginator
+
+
+async def check_throttles(drf_request, view):
+    """Как APIView.check_throttles; ответ 429 с Retry-After строит
+    исходное DRF-представление"""
+    for throttle in view.throttle_classes:
+        allowed = await sync_to_async(throttle().allow_request)(
+            drf_request, view
+        )
+        if not allowed:
+            raise Fallback
+
+
+def get_recipe_view(drf_request):
+    return RecipeViewSet(request=drf_request, action="list")
+
+
+def get_fields(view):
+    try:
+        return view.get_sparse_fields()
+    except ValidationError:
+        raise Fallback
+
+
+@async_read_view
+async def recipe_list(request):
+    if "ordering" in request.GET:
+        raise Fallback
+    drf_request = await make_drf_request(request)
+    view = get_recipe_view(drf_request)
+    fields = get_fields(view)
+    filterset = RecipeFilter(
+        request.GET,
+        queryset=view.get_queryset(),
+        request=drf_request,
+    )
+    if not await sync_to_async(filterset.is_valid)():
+        raise Fallback
+    queryset = view.get_validators_queryset(filterset.qs)
+    key = None
+    if not drf_request.user.is_authenticated:
+        key = get_feed_key(request)
+    if key is not None:
+
+        async def render_list():
+            paginator = await paginate(drf_request, queryset)
+            return ORJSONRenderer().render(
+                await get_page_data(request, paginator, fields)
+            )
+
+        response = feed_response(
+            request, await aget_feed_entry(key, render_list)
+        )
+        patch_vary_headers(response, ("Accept",))
+        return response
+    paginator = await paginate(drf_request, queryset)
+    etag = make_etag(
+        request.build_absolute_uri(),
+        paginator.page.paginator.count,
+        list(paginator.page),
+    )
+    response = get_not_modified_response(request, etag, None)
+    if response is None:
+        response = render(await get_page_data(request, paginator, fields))
+    return set_validators(response, etag, None)
+
+
+async def get_page_data(request, paginator, fields):
+    return {
+        "count": paginator.page.paginator.count,
+        "next": paginator.get_next_link(),
+        "previous": paginator.get_previous_link(),
+        "results": await aserialize_recipes(
+            list(paginator.page), request, fields
+        ),
+    }
+
+
+@async_read_view
+async def recipe_detail(request, pk):
+    drf_request = await make_drf_request(request)
+    view = get_recipe_view(drf_request)
+    fields = get_fields(view)
+    queryset = view.get_queryset().filter(pk=pk)
+    row = await view.get_validators_queryset(queryset).afirst()
+    if row is None:
+        raise Fallback
+    last_modified = None
+    if not drf_request.user.is_authenticated:
+        last_modified = latest(*row[1:3])
+    etag = make_etag(request.build_absolute_uri(), row)
+    response = get_not_modified_response(request, etag, last_modified)
+    if response is None:
+        recipes = await aserialize_recipes([row], request, fields)
+        response = render(recipes[0])
+    return set_validators(response, etag, last_modified)
+
+
+@async_read_view
+async def tag_list(request):
+    return await catalog_response(TAGS_CACHE_KEY)
+
+
+@async_read_view
+async def tag_detail(request, pk):
+    try:
+        tag = await Tag.objects.aget(pk=pk)
+    except Tag.DoesNotExist:
+        raise Fallback
+    return render(TagSerializer(tag).data)
+
+
+@async_read_view
+async def ingredient_list(request):
+    if not request.GET.get(IngredientsSearchFilter.search_param):
+        return await catalog_response(INGREDIENTS_CACHE_KEY)
+    drf_request = await make_drf_request(request)
+    await check_throttles(
+        drf_request, IngredientViewSet(request=drf_request, action="list")
+    )
+    queryset = IngredientsSearchFilter().filter_queryset(
+        drf_request,
+        optimize_queryset(Ingredient.objects.all(), IngredientSerializer()),
+        IngredientViewSet,
+    )
+    ingredients = [ingredient async for ingredient in queryset]
+    return render(IngredientSerializer(ingredients, many=True).data)
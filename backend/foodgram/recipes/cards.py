@@ -0,0 +1,238 @@
+"""
+Проекция карточек рецептов для эндпоинтов чтения.
+
+RecipeCard хранит рецепт с автором, тегами и ингредиентами в формате
+RecipeReadSerializer без полей текущего пользователя, а изображение -
+именем файла. Список и страница рецепта читают карточки одним запросом
+к одной таблице вместо соединений с пользователями, тегами,
+ингредиентами и единицами измерения.
+
+Карточка пересобирается в транзакции записи рецепта (сериализатор и
+админка) и сигналами при изменении тегов, ингредиентов, единиц
+измерения и профиля автора. Недостающие карточки собираются при чтении
+из исходных таблиц; заполнить их заранее можно командой
+rebuild_recipe_cards. При ?fields= и ?omit= из карточки читаются только
+нужные ключи JSON.
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db.models.fields.json import KeyTransform
+
+from helpfiles import constants
+
+from .models import (
+    Ingredient,
+    IngredientsRecipes,
+    MeasurementUnit,
+    Recipe,
+    RecipeCard,
+    RecipesTags,
+    Tag
+)
+
+User = get_user_model()
+
+RECIPE_COLUMNS = (
+    "id",
+    "author__email",
+    "author_id",
+    "author__username",
+    "author__first_name",
+    "author__last_name",
+    "name",
+    "image",
+    "text",
+    "cooking_time",
+)
+TAG_FIELDS = (
+    "recipe_id",
+    "tags_id",
+    "tags__name",
+    "tags__color",
+    "tags__slug",
+)
+INGREDIENT_FIELDS = (
+    "recipe_id",
+    "ingredient_id",
+    "ingredient__name",
+    "ingredient__measurement_unit__measurement_unit",
+    "amount",
+)
+
+# Ключи карточки, кроме id: он есть в строках валидаторов.
+CARD_KEYS = (
+    "tags",
+    "author",
+    "ingredients",
+    "name",
+    "image",
+    "text",
+    "cooking_time",
+)
+
+# Модель, путь от рецепта к ней и поля, попадающие в карточку.
+CARD_DEPENDENCIES = {
+    Tag: ("tags", ("name", "color", "slug")),
+    Ingredient: ("ingredients", ("name", "measurement_unit")),
+    MeasurementUnit: (
+        "ingredients__measurement_unit",
+        ("measurement_unit",),
+    ),
+    User: ("author", ("email", "username", "first_name", "last_name")),
+}
+
+
+def get_querysets(ids):
+    """Запросы за рецептами, их тегами и ингредиентами"""
+    return (
+        Recipe.objects.filter(pk__in=ids).order_by().values(*RECIPE_COLUMNS),
+        RecipesTags.objects.filter(recipe_id__in=ids)
+        .order_by("tags__name", "tags__created")
+        .values_list(*TAG_FIELDS),
+        IngredientsRecipes.objects.filter(recipe_id__in=ids)
+        .order_by("id")
+        .values_list(*INGREDIENT_FIELDS),
+    )
+
+
+def build_cards(recipes, tags, ingredients):
+    """Карточки {id рецепта: карточка} из строк get_querysets"""
+    recipe_tags = defaultdict(list)
+    for recipe_id, *tag in tags:
+        recipe_tags[recipe_id].append(
+            {"id": tag[0], "name": tag[1], "color": tag[2], "slug": tag[3]}
+        )
+    recipe_ingredients = defaultdict(list)
+    for recipe_id, *ingredient in ingredients:
+        recipe_ingredients[recipe_id].append(
+            {
+                "id": ingredient[0],
+                "name": ingredient[1],
+                "measurement_unit": ingredient[2],
+                "amount": ingredient[3],
+            }
+        )
+    return {
+        recipe["id"]: {
+            "id": recipe["id"],
+            "tags": recipe_tags[recipe["id"]],
+            "author": {
+                "email": recipe["author__email"],
+                "id": recipe["author_id"],
+                "username": recipe["author__username"],
+                "first_name": recipe["author__first_name"],
+                "last_name": recipe["author__last_name"],
+            },
+            "ingredients": recipe_ingredients[recipe["id"]],
+            "name": recipe["name"],
+            "image": recipe["image"],
+            "text": recipe["text"],
+            "cooking_time": recipe["cooking_time"],
+        }
+        for recipe in recipes
+    }
+
+
+def get_card_queryset(ids, keys):
+    """Строки (id рецепта, карточка); keys - нужные ключи карточки или
+    None для карточки целиком"""
+    # Без order_by сортировка по recipe тянула бы соединение с рецептами
+    # ради их порядка по умолчанию.
+    queryset = RecipeCard.objects.filter(recipe_id__in=ids).order_by()
+    if keys is None:
+        return queryset.values_list("recipe_id", "data")
+    # Ключ JSON извлекается в БД (data -> 'key'), остальная карточка не
+    # читается.
+    return queryset.values_list(
+        "recipe_id", *(KeyTransform(key, "data") for key in keys)
+    )
+
+
+def get_card(row, keys):
+    if keys is None:
+        return row[1]
+    return dict(zip(keys, row[1:]))
+
+
+def get_missing_cards(querysets, keys):
+    cards = build_cards(*querysets)
+    if keys is not None:
+        cards = {
+            recipe_id: {key: card[key] for key in keys}
+            for recipe_id, card in cards.items()
+        }
+    return cards
+
+
+def get_cards(ids, keys=None):
+    """Карточки {id рецепта: карточка}; недостающие собираются из
+    исходных таблиц"""
+    if keys is not None and not keys:
+        return {pk: {} for pk in ids}
+    cards = {
+        row[0]: get_card(row, keys) for row in get_card_queryset(ids, keys)
+    }
+    missing = [pk for pk in ids if pk not in cards]
+    if missing:
+        cards.update(
+            get_missing_cards(
+                [list(queryset) for queryset in get_querysets(missing)],
+                keys,
+            )
+        )
+    return cards
+
+
+async def aget_cards(ids, keys=None):
+    if keys is not None and not keys:
+        return {pk: {} for pk in ids}
+    cards = {
+        row[0]: get_card(row, keys)
+        async for row in get_card_queryset(ids, keys)
+    }
+    missing = [pk for pk in ids if pk not in cards]
+    if missing:
+        cards.update(
+            get_missing_cards(
+                [
+                    [item async for item in queryset]
+                    for queryset in get_querysets(missing)
+                ],
+                keys,
+            )
+        )
+    return cards
+
+
+def rebuild_cards(ids):
+    """Пересобирает карточки рецептов; удалённые рецепты пропускаются"""
+    ids = list(ids)
+    for start in range(0, len(ids), constants.RECIPE_CARDS_BATCH_SIZE):
+        batch = ids[start:start + constants.RECIPE_CARDS_BATCH_SIZE]
+        cards = build_cards(
+            *(list(queryset) for queryset in get_querysets(batch))
+        )
+        RecipeCard.objects.bulk_create(
+            [
+                RecipeCard(recipe_id=recipe_id, data=data)
+                for recipe_id, data in cards.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["recipe"],
+            update_fields=["data", "modified"],
+        )
+
+
+def get_dependent_ids(instance, update_fields=None):
+    """Рецепты, карточки которых выводят instance; пусто, если
+    сохранены только поля, которых нет в карточке"""
+    lookup, fields = CARD_DEPENDENCIES[type(instance)]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return []
+    return list(
+        Recipe.objects.filter(**{lookup: instance})
+        .order_by()
+        .values_list("pk", flat=True)
+        .distinct()
+    )
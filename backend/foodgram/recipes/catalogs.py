@@ -0,0 +1,81 @@
+"""
+Справочники тегов и ингредиентов, которые отдаются целиком и меняются
+редко: тело ответа хранится в кэше сразу в сжатом виде.
+"""
+from django.core.cache import cache
+
+from helpfiles import constants
+from helpfiles.compression import (
+    aget_precompressed,
+    get_precompressed,
+    precompressed_response
+)
+from helpfiles.optimizer import optimize_queryset
+from helpfiles.renderers import ORJSONRenderer, is_plain_json
+
+from .models import Ingredient, Tag
+from .serializers import IngredientSerializer, TagSerializer
+
+TAGS_CACHE_KEY = "catalog:tags"
+INGREDIENTS_CACHE_KEY = "catalog:ingredients"
+
+
+def render_tags():
+    tags = optimize_queryset(Tag.objects.all(), TagSerializer())
+    return ORJSONRenderer().render(TagSerializer(tags, many=True).data)
+
+
+def render_ingredients():
+    ingredients = optimize_queryset(
+        Ingredient.objects.all(), IngredientSerializer()
+    )
+    return ORJSONRenderer().render(
+        IngredientSerializer(ingredients, many=True).data
+    )
+
+
+CATALOGS = {
+    TAGS_CACHE_KEY: render_tags,
+    INGREDIENTS_CACHE_KEY: render_ingredients,
+}
+
+
+def get_catalog_response(key):
+    return precompressed_response(
+        get_precompressed(
+            key, CATALOGS[key], constants.CATALOG_CACHE_TIMEOUT
+        )
+    )
+
+
+async def aget_catalog_response(key):
+    return precompressed_response(
+        await aget_precompressed(
+            key, CATALOGS[key], constants.CATALOG_CACHE_TIMEOUT
+        )
+    )
+
+
+def warm_catalogs():
+    """Заполняет кэш справочников, которых в нём ещё нет"""
+    for key, render in CATALOGS.items():
+        get_precompressed(key, render, constants.CATALOG_CACHE_TIMEOUT)
+
+
+def invalidate_catalogs(*keys):
+    cache.delete_many(keys or CATALOGS)
+
+
+class CatalogMixin:
+    """list отдаёт закэшированный справочник, если клиенту нужен
+    обычный JSON"""
+
+    catalog_cache_key = None
+
+    def is_catalog_request(self, request):
+        return is_plain_json(request)
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_catalog_request(request):
+            return super().list(request, *args, **kwargs)
+        return get_catalog_response(self.catalog_cache_key)
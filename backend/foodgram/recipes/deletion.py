@@ -0,0 +1,45 @@
+"""
+Мягкое удаление рецептов и пользователей.
+
+Помеченные объекты сразу пропадают из API, ленты и админки, а удаляются
+вместе с зависимыми строками командой purge_deleted, см.
+helpfiles/deletion.py.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from .feed import invalidate_feed
+from .models import Favorite, PopularityRemoval, Recipe, ShoppingCart
+
+
+def soft_delete_recipes(queryset):
+    """Помечает рецепты queryset удалёнными"""
+    count = queryset.update(deleted_at=timezone.now())
+    if count:
+        invalidate_feed()
+    return count
+
+
+def soft_delete_users(queryset):
+    """Помечает пользователей и их рецепты удалёнными и закрывает вход"""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(queryset.values_list("pk", flat=True))
+        count = queryset.model.all_objects.filter(pk__in=ids).update(
+            deleted_at=now, is_active=False
+        )
+        soft_delete_recipes(Recipe.objects.filter(author_id__in=ids))
+        # Избранное и списки покупок удалённых пользователей больше не
+        # учитываются в популярности рецептов.
+        PopularityRemoval.objects.bulk_create(
+            PopularityRemoval(recipe_id=recipe_id)
+            for model in (Favorite, ShoppingCart)
+            for recipe_id in model.objects.filter(user_id__in=ids)
+            .order_by()
+            .values_list("recipe_id", flat=True)
+            .distinct()
+        )
+        Token.objects.filter(user_id__in=ids).delete()
+    return count
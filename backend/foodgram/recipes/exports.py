@@ -0,0 +1,92 @@
+"""
+Выгрузки списка покупок в PDF.
+
+Файл называется по хэшу содержимого списка: одинаковый список не
+рендерится повторно, а имя файла служит ETag. Файлы лежат в
+EXPORTS_ROOT вне MEDIA_ROOT и отдаются nginx только после проверки прав
+(см. helpfiles/files.py); старые удаляет команда clear_exports.
+
+ReportLab импортируется при первой выгрузке, а не при загрузке модуля:
+он нужен одному эндпоинту и заметно удлиняет запуск воркера.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from . import generate_pdf
+
+# Меняется вместе с оформлением PDF, чтобы не отдавать старые файлы.
+EXPORT_VERSION = 1
+
+
+def get_export_name(ingredients):
+    digest = hashlib.sha256(
+        repr((EXPORT_VERSION, ingredients)).encode()
+    ).hexdigest()
+    return f"{digest[:2]}/{digest}.pdf"
+
+
+def get_export(ingredients):
+    """Имя и путь PDF для списка ingredients; файл создаётся, если его
+    ещё нет"""
+    name = get_export_name(ingredients)
+    path = Path(settings.EXPORTS_ROOT) / name
+    try:
+        # Отметка для clear_exports: файл ещё используется. Если
+        # clear_exports успел его удалить, файл создаётся заново.
+        os.utime(path)
+        return name, path
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Запись во временный файл и переименование: параллельный запрос
+    # не увидит недописанный PDF.
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, suffix=".tmp", delete=False
+    ) as file:
+        write_pdf(ingredients, file)
+    os.replace(file.name, path)
+    return name, path
+
+
+def register_font():
+    """Шрифт разбирается один раз на процесс"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    if generate_pdf.PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return
+    pdfmetrics.registerFont(
+        TTFont(
+            generate_pdf.PDF_FONT_NAME,
+            generate_pdf.PDF_FONT_DIR / generate_pdf.PDF_FONT_FILE,
+        )
+    )
+
+
+def write_pdf(ingredients, file):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen.canvas import Canvas
+
+    register_font()
+    canvas = Canvas(file)
+    canvas.setFont(
+        generate_pdf.PDF_FONT_NAME, generate_pdf.PDF_TITLE_FONT_SIZE
+    )
+    canvas.drawCentredString(
+        A4[0] / 2, A4[1] - generate_pdf.PDF_INDENT, "Список покупок:"
+    )
+    canvas.setFont(generate_pdf.PDF_FONT_NAME, generate_pdf.PDF_TEXT_FONT_SIZE)
+    for index, ingredient in enumerate(ingredients):
+        canvas.drawString(
+            generate_pdf.PDF_INDENT,
+            A4[1]
+            - generate_pdf.PDF_INDENT
+            - (generate_pdf.PDF_TEXT_FONT_SIZE + generate_pdf.PDF_GAP)
+            * (index + 1),
+            (f"{ingredient[0]} {ingredient[1]} {ingredient[2]}"),
+        )
+    canvas.save()
@@ -0,0 +1,75 @@
+"""
+Быстрая сериализация рецептов для эндпоинтов чтения.
+
+Собирает тот же JSON, что и RecipeReadSerializer, из карточек рецептов
+(см. cards.py) и строк валидаторов в обычные словари без полей DRF.
+Для ?fields= и ?omit= из карточек читаются только нужные ключи.
+Совпадение вывода проверяет команда bench_serializers.
+"""
+from .cards import CARD_KEYS, aget_cards, get_cards
+from .models import Recipe
+from .serializers import RecipeReadSerializer
+
+RECIPE_FIELDS = RecipeReadSerializer.Meta.fields
+
+
+def get_image_url(name, request=None):
+    """Как ImageField DRF: None для пустого файла, абсолютный URL при
+    наличии запроса"""
+    if not name:
+        return None
+    url = Recipe._meta.get_field("image").storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def get_card_keys(fields):
+    """Ключи карточки для полей ответа; None - карточка целиком"""
+    if fields == RECIPE_FIELDS:
+        return None
+    return [key for key in CARD_KEYS if key in fields]
+
+
+def build_recipes(rows, cards, request, fields):
+    """Словари рецептов в порядке строк валидаторов.
+
+    rows - строки RecipeViewSet.get_validators_queryset, последние три
+    значения которых - is_favorited, is_in_shopping_cart и
+    author_is_subscribed; cards - карточки из cards.get_cards."""
+    sparse = fields != RECIPE_FIELDS
+    result = []
+    for row in rows:
+        card = cards.get(row[0])
+        if card is None:
+            continue
+        is_favorited, is_in_shopping_cart, is_subscribed = row[-3:]
+        author = card.get("author")
+        item = {
+            "id": row[0],
+            "tags": card.get("tags"),
+            "author": author and {**author, "is_subscribed": is_subscribed},
+            "ingredients": card.get("ingredients"),
+            "is_favorited": is_favorited,
+            "is_in_shopping_cart": is_in_shopping_cart,
+            "name": card.get("name"),
+            "image": get_image_url(card.get("image"), request),
+            "text": card.get("text"),
+            "cooking_time": card.get("cooking_time"),
+        }
+        if sparse:
+            item = {name: item[name] for name in fields}
+        result.append(item)
+    return result
+
+
+def serialize_recipes(rows, request, fields=RECIPE_FIELDS):
+    cards = get_cards([row[0] for row in rows], get_card_keys(fields))
+    return build_recipes(rows, cards, request, fields)
+
+
+async def aserialize_recipes(rows, request, fields=RECIPE_FIELDS):
+    cards = await aget_cards(
+        [row[0] for row in rows], get_card_keys(fields)
+    )
+    return build_recipes(rows, cards, request, fields)
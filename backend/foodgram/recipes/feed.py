@@ -0,0 +1,200 @@
+"""
+Кэш ленты рецептов для анонимных пользователей.
+
+Анонимные запросы первых страниц /api/recipes/ с одинаковыми
+параметрами получают один и тот же ответ, поэтому тело хранится в кэше
+целиком и сразу в сжатом виде. Ключ строится по нормализованным
+параметрам: параметры, которые не влияют на ответ, отбрасываются, а
+параметры и их значения сортируются.
+
+Запись свежа FEED_CACHE_TIMEOUT секунд и ещё FEED_CACHE_STALE секунд
+отдаётся устаревшей, пока её пересобирает один запрос: пересборку
+выполняет тот, кто первым добавит ключ блокировки через cache.add, а
+одновременные промахи без записи ждут его результата. Изменения
+рецептов после фиксации транзакции меняют поколение кэша, и записи
+прошлых поколений не отдаются. Поколение хранится в отдельном кэше
+FEED_GENERATION_CACHE, где его не вытеснят другие ключи; пропавшее
+поколение заменяется новым, то есть все записи становятся промахами.
+Нужны только get, add и delete, поэтому кэш работает и на локальном,
+и на файловом бэкенде Django.
+"""
+import asyncio
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+from helpfiles import constants
+from helpfiles.compression import precompress, precompressed_response
+from helpfiles.conditional import (
+    get_not_modified_response,
+    make_etag,
+    set_validators
+)
+from helpfiles.fields import split_fields
+from users.pagination import FoodgramPaginator
+
+from .filters import RecipeFilter
+
+GENERATION_KEY = "feed:generation"
+generation_cache = caches[settings.FEED_GENERATION_CACHE]
+PAGE_PARAM = FoodgramPaginator.page_query_param
+LIMIT_PARAM = FoodgramPaginator.page_size_query_param
+FIELD_PARAMS = (constants.FIELDS_QUERY_PARAM, constants.OMIT_QUERY_PARAM)
+FEED_PARAMS = {
+    *RecipeFilter.base_filters,
+    PAGE_PARAM,
+    LIMIT_PARAM,
+    "ordering",
+    *FIELD_PARAMS,
+}
+
+
+def get_params(request):
+    """Параметры запроса, влияющие на ответ, в каноническом виде"""
+    params = {}
+    for name in sorted(FEED_PARAMS.intersection(request.GET)):
+        values = request.GET.getlist(name)
+        if name in FIELD_PARAMS:
+            values = [",".join(sorted(split_fields(",".join(values))))]
+        values = sorted(
+            value.strip() for value in values if value and value.strip()
+        )
+        if values:
+            params[name] = values
+    return params
+
+
+def get_feed_key(request):
+    """Ключ кэша или None, если страница не кэшируется"""
+    params = get_params(request)
+    page = params.get(PAGE_PARAM, ["1"])
+    limit = params.get(LIMIT_PARAM, [str(FoodgramPaginator.page_size)])
+    if not (
+        len(page) == 1
+        and page[0].isdigit()
+        and int(page[0]) <= constants.FEED_CACHE_MAX_PAGE
+        and len(limit) == 1
+        and limit[0].isdigit()
+        and int(limit[0]) <= constants.FEED_CACHE_MAX_LIMIT
+    ):
+        return None
+    digest = hashlib.sha256(
+        repr(
+            (request.scheme, request.get_host(), request.path, params)
+        ).encode()
+    ).hexdigest()
+    return f"feed:{digest}"
+
+
+def make_entry(generation, content):
+    return {
+        "generation": generation,
+        "fresh_until": time.time() + constants.FEED_CACHE_TIMEOUT,
+        "variants": precompress(content),
+        "etag": make_etag(content),
+    }
+
+
+def get_generation():
+    """Текущее поколение кэша; пропавшее создаётся заново"""
+    generation = generation_cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not generation_cache.add(GENERATION_KEY, generation, None):
+            generation = generation_cache.get(GENERATION_KEY, generation)
+    return generation
+
+
+async def aget_generation():
+    generation = await generation_cache.aget(GENERATION_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not await generation_cache.aadd(GENERATION_KEY, generation, None):
+            generation = await generation_cache.aget(
+                GENERATION_KEY, generation
+            )
+    return generation
+
+
+def get_valid_entry(entry, generation):
+    """Запись, если она текущего поколения"""
+    if entry is None or entry["generation"] != generation:
+        return None
+    return entry
+
+
+def get_feed_entry(key, render):
+    """Запись кэша; render строит тело при промахе"""
+    generation = get_generation()
+    entry = get_valid_entry(cache.get(key), generation)
+    if entry is not None and entry["fresh_until"] > time.time():
+        return entry
+    lock = f"{key}:lock"
+    if cache.add(lock, True, constants.FEED_LOCK_TIMEOUT):
+        try:
+            fresh = make_entry(generation, render())
+            cache.set(
+                key,
+                fresh,
+                constants.FEED_CACHE_TIMEOUT + constants.FEED_CACHE_STALE,
+            )
+            return fresh
+        finally:
+            cache.delete(lock)
+    if entry is not None:
+        return entry
+    deadline = time.monotonic() + constants.FEED_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(constants.FEED_LOCK_POLL)
+        entry = get_valid_entry(cache.get(key), generation)
+        if entry is not None:
+            return entry
+    # Пересборка затянулась или упала: ответ строится без кэша.
+    return make_entry(generation, render())
+
+
+async def aget_feed_entry(key, render):
+    """Асинхронная get_feed_entry; render - корутинная функция"""
+    generation = await aget_generation()
+    entry = get_valid_entry(await cache.aget(key), generation)
+    if entry is not None and entry["fresh_until"] > time.time():
+        return entry
+    lock = f"{key}:lock"
+    if await cache.aadd(lock, True, constants.FEED_LOCK_TIMEOUT):
+        try:
+            fresh = make_entry(generation, await render())
+            await cache.aset(
+                key,
+                fresh,
+                constants.FEED_CACHE_TIMEOUT + constants.FEED_CACHE_STALE,
+            )
+            return fresh
+        finally:
+            await cache.adelete(lock)
+    if entry is not None:
+        return entry
+    deadline = time.monotonic() + constants.FEED_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(constants.FEED_LOCK_POLL)
+        entry = get_valid_entry(await cache.aget(key), generation)
+        if entry is not None:
+            return entry
+    return make_entry(generation, await render())
+
+
+def feed_response(request, entry):
+    response = get_not_modified_response(request, entry["etag"], None)
+    if response is None:
+        response = precompressed_response(entry["variants"])
+    return set_validators(response, entry["etag"], None)
+
+
+def invalidate_feed():
+    """Меняет поколение кэша после фиксации текущей транзакции"""
+    transaction.on_commit(
+        lambda: generation_cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+    )
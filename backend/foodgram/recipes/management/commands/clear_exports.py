@@ -0,0 +1,31 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from helpfiles import constants
+
+
+class Command(BaseCommand):
+    """Команда для удаления неиспользуемых выгрузок списка покупок"""
+
+    help = (
+        "delete shopping list PDF exports that have not been requested "
+        "for the given number of days; run it periodically"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=constants.EXPORTS_MAX_AGE_DAYS
+        )
+
+    def handle(self, *args, **options):
+        # get_export обновляет время изменения файла при каждой выдаче.
+        deadline = time.time() - options["days"] * 24 * 60 * 60
+        deleted = 0
+        for path in Path(settings.EXPORTS_ROOT).glob("*/*"):
+            if path.stat().st_mtime < deadline:
+                path.unlink(missing_ok=True)
+                deleted += 1
+        self.stdout.write(f"Удалено выгрузок: {deleted}")
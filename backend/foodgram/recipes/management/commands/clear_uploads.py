@@ -0,0 +1,47 @@
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from helpfiles import constants
+from recipes.models import ImageUpload
+
+
+class Command(BaseCommand):
+    """Команда для удаления брошенных загрузок изображений"""
+
+    help = (
+        "delete image uploads that were not used by a recipe within the "
+        "given number of hours, and upload files left without a record; "
+        "run it periodically"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=float,
+            default=constants.IMAGE_UPLOAD_MAX_AGE_HOURS,
+        )
+
+    def handle(self, *args, **options):
+        deadline = timezone.now() - timedelta(hours=options["hours"])
+        deleted, _ = ImageUpload.objects.filter(created__lt=deadline).delete()
+        tokens = {
+            str(token)
+            for token in ImageUpload.objects.values_list("token", flat=True)
+        }
+        # Файлы без записи остаются, например, после удаления
+        # пользователя; свежие файлы могут принадлежать новой записи.
+        files = 0
+        for path in Path(settings.UPLOADS_ROOT).glob("*"):
+            if (
+                path.name not in tokens
+                and path.stat().st_mtime < deadline.timestamp()
+            ):
+                path.unlink(missing_ok=True)
+                files += 1
+        self.stdout.write(
+            f"Удалено загрузок: {deleted}, файлов без записи: {files}"
+        )
@@ -4,6 +4,7 @@ from django.core.management.base import BaseCommand
 from django.db import IntegrityError, transaction
 
 from orjson import loads
+from recipes.catalogs import INGREDIENTS_CACHE_KEY, invalidate_catalogs
 from recipes.models import Ingredient, MeasurementUnit
 
 from foodgram import settings
@@ -59,6 +60,10 @@ class Command(BaseCommand):
             )
             raise
 
+        # bulk_create не отправляет сигналы, сбрасываем кэш справочника.
+        transaction.on_commit(
+            lambda: invalidate_catalogs(INGREDIENTS_CACHE_KEY)
+        )
         self.stdout.write(
             f"Импорт прошел успешно добавлено {len(bulk_ingredients)} "
             f"ингредиентов и {len(bulk_measurement_unit)} единиц измерения"
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from helpfiles import constants
+from helpfiles.deletion import purge
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Команда для удаления помеченных на удаление рецептов и
+    пользователей"""
+
+    help = (
+        "delete recipes and users soft-deleted more than the given number "
+        "of hours ago together with their favorites, shopping lists, "
+        "ingredients and subscriptions, in short batched transactions; "
+        "run it periodically"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=float,
+            default=constants.PURGE_DELAY_HOURS,
+            help="удалять помеченные раньше, чем столько часов назад",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=constants.PURGE_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        deadline = timezone.now() - timedelta(hours=options["older_than"])
+        self.totals = {}
+        # Рецепты удалённых авторов помечены вместе с авторами, поэтому
+        # к удалению пользователей их уже не остаётся.
+        for model in (Recipe, User):
+            purge(
+                model.all_objects.filter(deleted_at__lte=deadline),
+                options["batch_size"],
+                self.report,
+            )
+        self.stdout.write(f"Удалено строк: {sum(self.totals.values())}")
+
+    def report(self, model, count):
+        label = model._meta.label
+        self.totals[label] = self.totals.get(label, 0) + count
+        self.stdout.write(f"{label}: удалено {self.totals[label]}")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipes.cards import rebuild_cards
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Команда для пересборки карточек рецептов"""
+
+    help = (
+        "rebuild the denormalized recipe cards served by the read "
+        "endpoints; by default only recipes without a card are processed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="пересобрать и уже существующие карточки",
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by("pk")
+        if not options["all"]:
+            recipes = recipes.filter(card__isnull=True)
+        # rebuild_cards сам делит рецепты на пачки.
+        ids = list(recipes.values_list("pk", flat=True))
+        rebuild_cards(ids)
+        self.stdout.write(f"Пересобрано карточек: {len(ids)}")
@@ -0,0 +1,163 @@
+import math
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from helpfiles import constants
+from recipes.models import (
+    Checkpoint,
+    Favorite,
+    PopularityRemoval,
+    Recipe,
+    RecipePopularity,
+    ShoppingCart
+)
+
+# Затухание exp(-λ(T - t)) = exp(-λT) * exp(λt): общий множитель exp(-λT)
+# не меняет порядок, поэтому хранится только log(Σ w * exp(λ(t - EPOCH))),
+# и оценки не нужно пересчитывать с течением времени.
+EPOCH = datetime(2023, 1, 1, tzinfo=dt_timezone.utc)
+DECAY = math.log(2) / timedelta(
+    days=constants.POPULARITY_HALF_LIFE_DAYS
+).total_seconds()
+SOURCES = (
+    (Favorite, constants.POPULARITY_FAVORITE_WEIGHT),
+    (ShoppingCart, constants.POPULARITY_SHOPPING_CART_WEIGHT),
+)
+
+
+def logaddexp(first, second):
+    """log(exp(first) + exp(second)) без переполнения"""
+    if first is None:
+        return second
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def batches(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    """Команда для пересчёта популярности рецептов"""
+
+    help = (
+        "recompute the popularity scores of recipes added to or removed "
+        "from favorites and shopping carts since the last run; run it "
+        "periodically"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="пересчитать все оценки заново",
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        # Свежие записи пропускаются, чтобы не потерять строки ещё не
+        # завершённых транзакций: их created меньше сдвигаемой отметки.
+        until = timezone.now() - timedelta(
+            seconds=constants.POPULARITY_SETTLE_SECONDS
+        )
+        checkpoint = (
+            Checkpoint.objects.select_for_update()
+            .filter(name=constants.POPULARITY_CHECKPOINT)
+            .first()
+        )
+        if checkpoint is None or options["full"]:
+            scores, events = self.collect(until)
+            RecipePopularity.objects.all().delete()
+            updated = self.save(scores)
+        else:
+            events = updated = 0
+            for batch in batches(
+                self.get_changed(checkpoint.value, until),
+                constants.POPULARITY_BATCH_SIZE,
+            ):
+                # Оценка рецепта считается заново по текущим записям,
+                # поэтому удаления из избранного и списка покупок её
+                # уменьшают.
+                scores, count = self.collect(until, batch)
+                RecipePopularity.objects.filter(recipe_id__in=batch).exclude(
+                    recipe_id__in=list(scores)
+                ).delete()
+                events += count
+                updated += self.save(scores)
+        PopularityRemoval.objects.filter(created__lte=until).delete()
+        RecipePopularity.objects.filter(
+            recipe__deleted_at__isnull=False
+        ).delete()
+        Checkpoint.objects.update_or_create(
+            name=constants.POPULARITY_CHECKPOINT, defaults={"value": until}
+        )
+        self.stdout.write(
+            f"Учтено событий: {events}, обновлено оценок: {updated}"
+        )
+
+    def get_changed(self, since, until):
+        """Рецепты, добавленные в избранное или список покупок либо
+        удалённые из них после прошлого запуска"""
+        changed = set(
+            PopularityRemoval.objects.filter(
+                created__gt=since, created__lte=until
+            ).values_list("recipe_id", flat=True)
+        )
+        for model, _ in SOURCES:
+            changed.update(
+                model.objects.filter(created__gt=since, created__lte=until)
+                .order_by()
+                .values_list("recipe_id", flat=True)
+                .distinct()
+            )
+        return sorted(changed)
+
+    def collect(self, until, recipe_ids=None):
+        """Логарифмы сумм вкладов событий по рецептам: всех или
+        recipe_ids. События удалённых пользователей не учитываются"""
+        scores = {}
+        events = 0
+        for model, weight in SOURCES:
+            queryset = model.objects.filter(
+                created__lte=until, user__deleted_at__isnull=True
+            )
+            if recipe_ids is not None:
+                queryset = queryset.filter(recipe_id__in=recipe_ids)
+            rows = (
+                queryset.order_by()
+                .values_list("recipe_id", "created")
+                .iterator(chunk_size=constants.POPULARITY_BATCH_SIZE)
+            )
+            for recipe_id, created in rows:
+                scores[recipe_id] = logaddexp(
+                    scores.get(recipe_id),
+                    math.log(weight)
+                    + DECAY * (created - EPOCH).total_seconds(),
+                )
+                events += 1
+        return scores, events
+
+    def save(self, scores):
+        updated = 0
+        for batch in batches(scores, constants.POPULARITY_BATCH_SIZE):
+            existing = Recipe.objects.filter(pk__in=batch).values_list(
+                "pk", flat=True
+            )
+            popularity = [
+                RecipePopularity(recipe_id=recipe_id, score=scores[recipe_id])
+                for recipe_id in existing
+            ]
+            RecipePopularity.objects.bulk_create(
+                popularity,
+                update_conflicts=True,
+                unique_fields=["recipe"],
+                update_fields=["score", "modified"],
+            )
+            updated += len(popularity)
+        return updated
@@ -0,0 +1,211 @@
+import os
+from array import array
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef
+
+import numpy as np
+from helpfiles import constants
+from recipes.models import IngredientsRecipes, Recipe, SimilarRecipe
+from scipy import sparse
+
+# Матрица передаётся воркерам при создании пула: при fork она не
+# копируется, а разделяется со страницами родителя.
+MATRIX = None
+TRANSPOSED = None
+
+
+def init_worker(matrix, transposed):
+    global MATRIX, TRANSPOSED
+    MATRIX, TRANSPOSED = matrix, transposed
+
+
+def top_neighbors(task):
+    """Top-K соседей по косинусу для строк [start, stop) матрицы"""
+    start, stop, top_k = task
+    block = (MATRIX[start:stop] @ TRANSPOSED).tocsr()
+    rows, columns, scores = [], [], []
+    for index in range(block.shape[0]):
+        low, high = block.indptr[index], block.indptr[index + 1]
+        neighbors = block.indices[low:high]
+        similarity = block.data[low:high]
+        mask = neighbors != start + index
+        neighbors, similarity = neighbors[mask], similarity[mask]
+        if len(similarity) > top_k:
+            top = np.argpartition(-similarity, top_k)[:top_k]
+            neighbors, similarity = neighbors[top], similarity[top]
+        rows.append(np.full(len(neighbors), start + index))
+        columns.append(neighbors)
+        scores.append(similarity)
+    return (
+        start,
+        stop,
+        np.concatenate(rows) if rows else np.empty(0, dtype=np.int64),
+        np.concatenate(columns) if columns else np.empty(0, dtype=np.int32),
+        np.concatenate(scores) if scores else np.empty(0, dtype=np.float32),
+    )
+
+
+class Command(BaseCommand):
+    """Команда для расчёта похожих рецептов по ингредиентам"""
+
+    help = (
+        "compute top-K similar recipes by cosine similarity of their "
+        "ingredient sets and store them for /recipes/{id}/similar/"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k", type=int, default=constants.SIMILAR_RECIPES_TOP_K
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=constants.SIMILAR_RECIPES_CHUNK_SIZE,
+            help="строк матрицы на одно умножение; ограничивает память",
+        )
+        parser.add_argument(
+            "--processes", type=int, default=os.cpu_count() or 1
+        )
+        parser.add_argument(
+            "--max-df",
+            type=float,
+            default=constants.SIMILAR_RECIPES_MAX_DF,
+            help=(
+                "доля рецептов, выше которой ингредиент не учитывается; "
+                "применяется от --max-df-min-recipes рецептов"
+            ),
+        )
+        parser.add_argument(
+            "--max-df-min-recipes",
+            type=int,
+            default=constants.SIMILAR_RECIPES_MAX_DF_MIN_RECIPES,
+        )
+        parser.add_argument(
+            "--min-df", type=int, default=constants.SIMILAR_RECIPES_MIN_DF
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids, matrix = self.build_matrix(
+            options["max_df"],
+            options["min_df"],
+            options["max_df_min_recipes"],
+        )
+        self.stdout.write(
+            f"Рецептов: {matrix.shape[0]}, ингредиентов: {matrix.shape[1]}, "
+            f"связей: {matrix.nnz}"
+        )
+        chunk_size = options["chunk_size"]
+        tasks = [
+            (
+                start,
+                min(start + chunk_size, matrix.shape[0]),
+                options["top_k"],
+            )
+            for start in range(0, matrix.shape[0], chunk_size)
+        ]
+        transposed = matrix.T.tocsr()
+        if options["processes"] > 1:
+            # Открытые соединения с БД не должны достаться дочерним
+            # процессам.
+            connections.close_all()
+            with Pool(
+                options["processes"],
+                initializer=init_worker,
+                initargs=(matrix, transposed),
+            ) as pool:
+                self.save_all(
+                    recipe_ids, pool.imap_unordered(top_neighbors, tasks)
+                )
+        else:
+            init_worker(matrix, transposed)
+            self.save_all(recipe_ids, map(top_neighbors, tasks))
+        # Рецепты без ингредиентов не попали в матрицу, их прежние соседи
+        # удаляются отдельно.
+        SimilarRecipe.objects.exclude(
+            Exists(
+                IngredientsRecipes.objects.filter(
+                    recipe_id=OuterRef("recipe_id"),
+                    recipe__deleted_at__isnull=True,
+                )
+            )
+        ).delete()
+
+    def build_matrix(self, max_df, min_df, max_df_min_recipes):
+        """Разреженная матрица рецепт x ингредиент с единичными строками"""
+        recipes, ingredients = array("q"), array("q")
+        rows = (
+            IngredientsRecipes.objects.filter(recipe__deleted_at__isnull=True)
+            .order_by()
+            .values_list("recipe_id", "ingredient_id")
+            .iterator(chunk_size=constants.SIMILAR_RECIPES_LOAD_BATCH_SIZE)
+        )
+        for recipe_id, ingredient_id in rows:
+            recipes.append(recipe_id)
+            ingredients.append(ingredient_id)
+        recipe_ids, row_index = np.unique(
+            np.frombuffer(recipes, dtype=np.int64), return_inverse=True
+        )
+        _, column_index = np.unique(
+            np.frombuffer(ingredients, dtype=np.int64), return_inverse=True
+        )
+        del recipes, ingredients
+        matrix = sparse.csr_matrix(
+            (
+                np.ones(len(row_index), dtype=np.float32),
+                (row_index.astype(np.int32), column_index.astype(np.int32)),
+            ),
+            shape=(len(recipe_ids), column_index.max(initial=-1) + 1),
+        )
+        # Слишком частые ингредиенты (соль, вода) не говорят о сходстве
+        # и делают произведение почти плотным, единичные - бесполезны. В
+        # небольшом каталоге доля max_df отбросила бы все ингредиенты,
+        # а произведение и без отбора невелико.
+        frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        keep = frequency >= min_df
+        if matrix.shape[0] >= max_df_min_recipes:
+            keep &= frequency <= max_df * matrix.shape[0]
+        matrix = matrix[:, np.flatnonzero(keep)].tocsr()
+        lengths = np.sqrt(np.diff(matrix.indptr)).astype(np.float32)
+        lengths[lengths == 0] = 1
+        matrix = sparse.diags(1 / lengths) @ matrix
+        return recipe_ids, matrix.tocsr()
+
+    def save_all(self, recipe_ids, results):
+        saved = 0
+        for start, stop, rows, columns, scores in results:
+            self.save(recipe_ids, start, stop, rows, columns, scores)
+            saved += stop - start
+            self.stdout.write(f"Обработано рецептов: {saved}")
+
+    @transaction.atomic
+    def save(self, recipe_ids, start, stop, rows, columns, scores):
+        """Заменяет соседей рецептов из строк [start, stop)"""
+        SimilarRecipe.objects.filter(
+            recipe_id__in=recipe_ids[start:stop].tolist()
+        ).delete()
+        pairs = list(
+            zip(
+                recipe_ids[rows].tolist(),
+                recipe_ids[columns].tolist(),
+                scores.tolist(),
+            )
+        )
+        # Рецепты, удалённые во время расчёта, пропускаются.
+        existing = set(
+            Recipe.objects.filter(
+                pk__in={pk for pair in pairs for pk in pair[:2]}
+            ).values_list("pk", flat=True)
+        )
+        SimilarRecipe.objects.bulk_create(
+            [
+                SimilarRecipe(
+                    recipe_id=recipe, similar_id=similar, score=score
+                )
+                for recipe, similar, score in pairs
+                if recipe in existing and similar in existing
+            ],
+            batch_size=constants.SIMILAR_RECIPES_SAVE_BATCH_SIZE,
+        )
@@ -1,9 +1,17 @@
+import hashlib
+import os
+import uuid
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import OpClass
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 from helpfiles import constants
-from helpfiles.Basemodel import BaseModelMixin
+from helpfiles.Basemodel import BaseModelMixin, SoftDeleteManager
+from helpfiles.files import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -72,11 +80,29 @@ class Ingredient(BaseModelMixin):
                 name="unique_ingredient",
             )
         ]
+        # Поиск по началу названия (istartswith) сравнивает UPPER(name).
+        indexes = [
+            models.Index(
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="ingredient_name_search_idx",
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
+def recipe_image_path(instance, filename):
+    """Путь изображения по хэшу содержимого: файл по такому адресу не
+    меняется, и nginx отдаёт его с долгим кэшированием"""
+    digest = hashlib.sha256()
+    for chunk in instance.image.file.chunks():
+        digest.update(chunk)
+    digest = digest.hexdigest()
+    extension = os.path.splitext(filename)[1].lower()
+    return f"img/{digest[:2]}/{digest}{extension}"
+
+
 class Recipe(BaseModelMixin):
     tags = models.ManyToManyField(
         Tag, verbose_name="Теги", through="RecipesTags"
@@ -109,23 +135,55 @@ class Recipe(BaseModelMixin):
     )
     image = models.ImageField(
         verbose_name="Изображение",
-        upload_to="img/%Y/%m/%d",
+        upload_to=recipe_image_path,
+        storage=ContentAddressedStorage(),
     )
     text = models.TextField(verbose_name="Описание")
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name="Время приготовления",
         validators=[MinValueValidator(1)],
     )
+    deleted_at = models.DateTimeField(
+        verbose_name="Удалён",
+        null=True,
+        blank=True,
+        help_text="Рецепт скрыт и будет удалён командой purge_deleted",
+    )
+
+    # Первый менеджер - менеджер по умолчанию: через него идут запросы
+    # представлений и связанных менеджеров автора.
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ("-created", "id")
+        indexes = [
+            models.Index(fields=["-created", "id"], name="recipe_created_idx"),
+            models.Index(
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="recipe_name_search_idx",
+            ),
+            # Для purge_deleted: помеченных на удаление рецептов мало.
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="recipe_deleted_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+def count_recipes():
+    """Число рецептов пользователя без помеченных на удаление"""
+    return models.Count(
+        "recipes", filter=models.Q(recipes__deleted_at__isnull=True)
+    )
+
+
 class RecipesTags(BaseModelMixin):
     recipe = models.ForeignKey(
         Recipe,
@@ -147,6 +205,9 @@ class RecipesTags(BaseModelMixin):
                 fields=["recipe", "tags"], name="unique_tags_for_recipe"
             )
         ]
+        indexes = [
+            models.Index(fields=["tags", "recipe"], name="recipe_tags_tag_idx")
+        ]
 
 
 class IngredientsRecipes(BaseModelMixin):
@@ -178,6 +239,126 @@ class IngredientsRecipes(BaseModelMixin):
         ]
 
 
+class FavoriteShopQuerySet(models.QuerySet):
+    ADD_SQL = """
+        WITH recipe AS (
+            SELECT id, name, image, cooking_time FROM {recipe_table}
+            WHERE id = ANY(%(recipes)s) AND deleted_at IS NULL
+        ), inserted AS (
+            INSERT INTO {table} (user_id, recipe_id, created, modified)
+            SELECT %(user)s, id, %(now)s, %(now)s FROM recipe
+            ON CONFLICT (user_id, recipe_id) DO NOTHING
+            RETURNING recipe_id
+        )
+        SELECT recipe.id, recipe.name, recipe.image, recipe.cooking_time,
+            inserted.recipe_id IS NOT NULL
+        FROM recipe LEFT JOIN inserted ON inserted.recipe_id = recipe.id
+    """
+    REMOVE_SQL = """
+        WITH recipe AS (
+            SELECT id FROM {recipe_table}
+            WHERE id = ANY(%(recipes)s) AND deleted_at IS NULL
+        ), deleted AS (
+            DELETE FROM {table}
+            WHERE user_id = %(user)s AND recipe_id IN (SELECT id FROM recipe)
+            RETURNING recipe_id
+        ), removal AS (
+            INSERT INTO {removal_table} (recipe_id, created, modified)
+            SELECT recipe_id, %(now)s, %(now)s FROM deleted
+        )
+        SELECT recipe.id, deleted.recipe_id IS NOT NULL
+        FROM recipe LEFT JOIN deleted ON deleted.recipe_id = recipe.id
+    """
+
+    def format_sql(self, sql):
+        return sql.format(
+            table=connection.ops.quote_name(self.model._meta.db_table),
+            recipe_table=connection.ops.quote_name(Recipe._meta.db_table),
+            removal_table=connection.ops.quote_name(
+                PopularityRemoval._meta.db_table
+            ),
+        )
+
+    def add(self, user, recipe_ids):
+        """Добавляет рецепты одним запросом INSERT ... ON CONFLICT.
+        Возвращает {id: (рецепт, признак добавления)} для существующих
+        рецептов"""
+        if connection.vendor != "postgresql":
+            return self._add_fallback(user, recipe_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                self.format_sql(self.ADD_SQL),
+                {
+                    "recipes": list(recipe_ids),
+                    "user": user.id,
+                    "now": timezone.now(),
+                },
+            )
+            rows = cursor.fetchall()
+        return {
+            row[0]: (
+                Recipe(
+                    id=row[0], name=row[1], image=row[2], cooking_time=row[3]
+                ),
+                row[4],
+            )
+            for row in rows
+        }
+
+    def remove(self, user, recipe_ids):
+        """Удаляет рецепты одним запросом DELETE ... RETURNING.
+        Возвращает {id: признак удаления} для существующих рецептов"""
+        if connection.vendor != "postgresql":
+            return self._remove_fallback(user, recipe_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                self.format_sql(self.REMOVE_SQL),
+                {
+                    "recipes": list(recipe_ids),
+                    "user": user.id,
+                    "now": timezone.now(),
+                },
+            )
+            return dict(cursor.fetchall())
+
+    def _add_fallback(self, user, recipe_ids):
+        recipes = Recipe.objects.filter(id__in=recipe_ids)
+        existing = set(
+            self.filter(user=user, recipe__in=recipes).values_list(
+                "recipe_id", flat=True
+            )
+        )
+        self.bulk_create(
+            [
+                self.model(user=user, recipe=recipe)
+                for recipe in recipes
+                if recipe.id not in existing
+            ],
+            ignore_conflicts=True,
+        )
+        return {
+            recipe.id: (recipe, recipe.id not in existing)
+            for recipe in recipes
+        }
+
+    def _remove_fallback(self, user, recipe_ids):
+        recipes = set(
+            Recipe.objects.filter(id__in=recipe_ids).values_list(
+                "id", flat=True
+            )
+        )
+        existing = set(
+            self.filter(user=user, recipe_id__in=recipes).values_list(
+                "recipe_id", flat=True
+            )
+        )
+        self.filter(user=user, recipe_id__in=existing).delete()
+        PopularityRemoval.objects.bulk_create(
+            [PopularityRemoval(recipe_id=recipe_id) for recipe_id in existing]
+        )
+        return {recipe_id: recipe_id in existing for recipe_id in recipes}
+
+
 class FavoriteShopMixin(BaseModelMixin):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, verbose_name="Пользователь"
@@ -186,6 +367,8 @@ class FavoriteShopMixin(BaseModelMixin):
         Recipe, on_delete=models.CASCADE, verbose_name="Рецепт"
     )
 
+    objects = FavoriteShopQuerySet.as_manager()
+
     class Meta:
         abstract = True
         constraints = [
@@ -193,17 +376,166 @@ class FavoriteShopMixin(BaseModelMixin):
                 fields=["user", "recipe"], name="unique_%(class)s_for_user"
             )
         ]
+        indexes = [
+            models.Index(fields=["created"], name="%(class)s_created_idx")
+        ]
 
 
+# Meta наследуется явно, иначе ограничения и индексы миксина не
+# применяются к таблицам.
 class Favorite(FavoriteShopMixin):
-    class Meta:
+    class Meta(FavoriteShopMixin.Meta):
         verbose_name = "Избранный рецепт"
         verbose_name_plural = "Избранные рецепты"
         ordering = ("id",)
 
 
 class ShoppingCart(FavoriteShopMixin):
-    class Meta:
+    class Meta(FavoriteShopMixin.Meta):
         verbose_name = "Список покупок"
         verbose_name_plural = "Список покупок"
         ordering = ("id",)
+
+
+class RecipePopularity(BaseModelMixin):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="popularity",
+        verbose_name="Рецепт",
+    )
+    score = models.FloatField(
+        verbose_name="Популярность",
+        help_text=(
+            "Логарифм суммы весов событий с множителем exp(λ·t), "
+            "не зависящий от момента расчёта"
+        ),
+    )
+
+    class Meta:
+        verbose_name = "Популярность рецепта"
+        verbose_name_plural = "Популярность рецептов"
+        ordering = ("-score", "recipe")
+        indexes = [
+            models.Index(
+                fields=["-score", "recipe"], name="recipe_popularity_idx"
+            )
+        ]
+
+
+class PopularityRemoval(BaseModelMixin):
+    """Удаление из избранного или списка покупок. По этим записям
+    update_popularity находит рецепты, чьи оценки нужно пересчитать"""
+
+    recipe_id = models.PositiveIntegerField(verbose_name="Рецепт")
+
+    class Meta:
+        verbose_name = "Удаление для пересчёта популярности"
+        verbose_name_plural = "Удаления для пересчёта популярности"
+        ordering = ("created",)
+        indexes = [
+            models.Index(
+                fields=["created"], name="popularity_removal_created_idx"
+            )
+        ]
+
+
+class Checkpoint(BaseModelMixin):
+    name = models.CharField(
+        verbose_name="Задача",
+        max_length=constants.NAME_MAX_LEN,
+        unique=True,
+    )
+    value = models.DateTimeField(verbose_name="Обработано до")
+
+    class Meta:
+        verbose_name = "Отметка пересчёта"
+        verbose_name_plural = "Отметки пересчёта"
+        ordering = ("name",)
+
+    def __str__(self):
+        return self.name
+
+
+class SimilarRecipe(BaseModelMixin):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="neighbors",
+        verbose_name="Рецепт",
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="neighbor_of",
+        verbose_name="Похожий рецепт",
+    )
+    score = models.FloatField(verbose_name="Сходство по ингредиентам")
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        ordering = ("recipe", "-score", "similar")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "similar"], name="unique_similar_recipe"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["recipe", "-score"], name="similar_recipe_score_idx"
+            )
+        ]
+
+
+class RecipeCard(BaseModelMixin):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="card",
+        verbose_name="Рецепт",
+    )
+    data = models.JSONField(
+        verbose_name="Карточка",
+        help_text="Рецепт с автором, тегами и ингредиентами, см. cards.py",
+    )
+
+    class Meta:
+        verbose_name = "Карточка рецепта"
+        verbose_name_plural = "Карточки рецептов"
+        ordering = ("recipe",)
+
+
+class ImageUpload(BaseModelMixin):
+    token = models.UUIDField(
+        verbose_name="Токен",
+        default=uuid.uuid4,
+        unique=True,
+        editable=False,
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="image_uploads",
+        verbose_name="Пользователь",
+    )
+    size = models.PositiveIntegerField(verbose_name="Размер, байт")
+    extension = models.CharField(
+        verbose_name="Расширение",
+        max_length=constants.IMAGE_EXTENSION_MAX_LEN,
+        blank=True,
+        help_text="Заполняется после проверки загруженного изображения",
+    )
+
+    class Meta:
+        verbose_name = "Загрузка изображения"
+        verbose_name_plural = "Загрузки изображений"
+        ordering = ("created",)
+
+    def __str__(self):
+        return str(self.token)
+
+    @property
+    def is_complete(self):
+        return bool(self.extension)
@@ -5,12 +5,17 @@ from django.core.files.base import ContentFile
 from django.db import models, transaction
 
 from helpfiles import constants
+from helpfiles.fields import SparseFieldsMixin
+from helpfiles.optimizer import optimize_queryset
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from users.serializers import UserSerializer
 
+from . import uploads
+from .cards import rebuild_cards
 from .models import (
     Favorite,
+    ImageUpload,
     Ingredient,
     IngredientsRecipes,
     Recipe,
@@ -46,6 +51,37 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class ImageUploadSerializer(serializers.ModelSerializer):
+    offset = serializers.SerializerMethodField()
+    complete = serializers.BooleanField(source="is_complete", read_only=True)
+
+    class Meta:
+        model = ImageUpload
+        fields = ("token", "size", "offset", "complete")
+        read_only_fields = ("token",)
+        extra_kwargs = {
+            "size": {
+                "min_value": 1,
+                "max_value": constants.IMAGE_UPLOAD_MAX_SIZE,
+            }
+        }
+
+    def get_offset(self, obj):
+        return uploads.get_offset(obj)
+
+
+class ImageUploadField(serializers.SlugRelatedField):
+    """Токен полностью загруженного изображения пользователя запроса"""
+
+    def __init__(self, **kwargs):
+        super().__init__(slug_field="token", **kwargs)
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(
+            user=self.context["request"].user
+        ).exclude(extension="")
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField(read_only=True)
     name = serializers.ReadOnlyField()
@@ -56,6 +92,18 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "image", "cooking_time")
 
 
+class RecipeBatchSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=constants.RECIPES_BATCH_MAX_LEN,
+    )
+
+    def validate_recipes(self, value):
+        """Убирает повторы, сохраняя порядок"""
+        return list(dict.fromkeys(value))
+
+
 class IngredientRecipeReadSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source="ingredient.id")
     name = serializers.ReadOnlyField(source="ingredient.name")
@@ -82,7 +130,7 @@ class IngredientsRecipesWriteSerializer(serializers.ModelSerializer):
         return value
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = IngredientRecipeReadSerializer(
@@ -115,7 +163,8 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     id = serializers.ReadOnlyField()
     ingredients = IngredientsRecipesWriteSerializer(many=True)
-    image = Base64ImageField()
+    image = Base64ImageField(required=False)
+    image_upload = ImageUploadField(write_only=True, required=False)
 
     class Meta:
         model = Recipe
@@ -124,6 +173,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             "ingredients",
             "tags",
             "image",
+            "image_upload",
             "name",
             "text",
             "cooking_time",
@@ -158,6 +208,18 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise ValidationError(
                 {"tags": "Все значения должны быть уникальными"}
             )
+        if "image" in attrs and "image_upload" in attrs:
+            raise ValidationError(
+                {"image_upload": "Нельзя передать вместе с image"}
+            )
+        if (
+            self.instance is None
+            and "image" not in attrs
+            and "image_upload" not in attrs
+        ):
+            raise ValidationError(
+                {"image": self.fields["image"].error_messages["required"]}
+            )
         return attrs
 
     @transaction.atomic
@@ -178,35 +240,42 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
-        recipe = Recipe.objects.create(
-            author=self.context["request"].user, **validated_data
-        )
+        with uploads.use_upload(validated_data):
+            recipe = Recipe.objects.create(
+                author=self.context["request"].user, **validated_data
+            )
         self.tags_and_ingredients_set(recipe, tags, ingredients)
+        rebuild_cards([recipe.pk])
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        instance.image = validated_data.get("image", instance.image)
-        instance.name = validated_data.get("name", instance.name)
-        instance.text = validated_data.get("text", instance.text)
-        instance.cooking_time = validated_data.get(
-            "cooking_time", instance.cooking_time
-        )
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
         IngredientsRecipes.objects.filter(
             recipe=instance, ingredient__in=instance.ingredients.all()
         ).delete()
         self.tags_and_ingredients_set(instance, tags, ingredients)
-        instance.save()
+        with uploads.use_upload(validated_data):
+            instance.image = validated_data.get("image", instance.image)
+            instance.name = validated_data.get("name", instance.name)
+            instance.text = validated_data.get("text", instance.text)
+            instance.cooking_time = validated_data.get(
+                "cooking_time", instance.cooking_time
+            )
+            instance.save()
+        rebuild_cards([instance.pk])
         return instance
 
     def to_representation(self, value):
         is_favorited = Favorite.objects.none()
         is_in_shopping_cart = ShoppingCart.objects.none()
-        value = Recipe.objects.filter(id=value.id).annotate(
-            is_favorited=models.Exists(is_favorited),
-            is_in_shopping_cart=models.Exists(is_in_shopping_cart)
+        serializer = RecipeReadSerializer(context=self.context)
+        value = optimize_queryset(
+            Recipe.objects.filter(id=value.id).annotate(
+                is_favorited=models.Exists(is_favorited),
+                is_in_shopping_cart=models.Exists(is_in_shopping_cart),
+            ),
+            serializer,
         ).first()
-        serializer = RecipeReadSerializer(value, context=self.context)
-        return serializer.data
+        return serializer.to_representation(value)
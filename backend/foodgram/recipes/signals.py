@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cards import get_dependent_ids, rebuild_cards
+from .catalogs import (
+    INGREDIENTS_CACHE_KEY,
+    TAGS_CACHE_KEY,
+    invalidate_catalogs
+)
+from .feed import invalidate_feed
+from .models import Ingredient, MeasurementUnit, Recipe, Tag
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    invalidate_catalogs(TAGS_CACHE_KEY)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=MeasurementUnit)
+def invalidate_ingredients(**kwargs):
+    invalidate_catalogs(INGREDIENTS_CACHE_KEY)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=MeasurementUnit)
+@receiver(post_save, sender=User)
+def rebuild_dependent_cards(instance, created, update_fields, **kwargs):
+    if not created:
+        ids = get_dependent_ids(instance, update_fields)
+        rebuild_cards(ids)
+        if ids:
+            invalidate_feed()
+
+
+# После удаления связи рецептов с объектом уже удалены каскадом, поэтому
+# рецепты запоминаются до него. Рецепты удалённого автора удаляются
+# вместе с карточками.
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+@receiver(pre_delete, sender=MeasurementUnit)
+def remember_dependent_cards(instance, **kwargs):
+    instance.dependent_card_ids = get_dependent_ids(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=MeasurementUnit)
+def rebuild_cards_after_delete(instance, **kwargs):
+    ids = getattr(instance, "dependent_card_ids", ())
+    rebuild_cards(ids)
+    if ids:
+        invalidate_feed()
+
+
+# Рецепт меняется сериализатором и админкой, теги и ингредиенты рецепта
+# сохраняются в той же транзакции.
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_feed(**kwargs):
+    invalidate_feed()
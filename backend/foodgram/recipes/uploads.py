@@ -0,0 +1,180 @@
+"""
+Загрузка изображений рецептов отдельно от JSON рецепта.
+
+Изображение в base64 внутри JSON на треть больше файла, а при проверке
+RecipeWriteSerializer в памяти одновременно лежат тело запроса, строка
+base64 и декодированные байты. Вместо этого файл загружается на
+/api/uploads/ одним multipart-запросом или частями PATCH с заголовком
+Upload-Offset, которые можно дослать после обрыва. Данные пишутся в
+UPLOADS_ROOT потоком и в памяти не собираются; смещение загрузки - это
+размер файла на диске, поэтому части не требуют записей в БД.
+
+Полностью загруженный файл проверяется Pillow по формату и размерам
+сторон, после чего рецепт ссылается на него полем image_upload с
+токеном загрузки. Использованная загрузка удаляется при сохранении
+рецепта, брошенные - командой clear_uploads. Изображение в base64 в
+поле image по-прежнему принимается.
+"""
+import fcntl
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler
+)
+from django.db import transaction
+
+from helpfiles import constants
+from PIL import Image
+from rest_framework import serializers
+
+OFFSET_HEADER = "Upload-Offset"
+CONTENT_TYPES = (
+    "application/offset+octet-stream",
+    "application/octet-stream",
+)
+
+
+class OffsetConflict(Exception):
+    """Часть начинается не с текущего смещения загрузки"""
+
+    def __init__(self, offset):
+        super().__init__(offset)
+        self.offset = offset
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет файл multipart-запроса во временный файл на диске и
+    прекращает приём, если он больше IMAGE_UPLOAD_MAX_SIZE"""
+
+    too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > constants.IMAGE_UPLOAD_MAX_SIZE:
+            self.too_large = True
+            raise StopUpload()
+        return super().receive_data_chunk(raw_data, start)
+
+
+def get_path(upload):
+    return Path(settings.UPLOADS_ROOT) / str(upload.token)
+
+
+def get_offset(upload):
+    try:
+        return get_path(upload).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def check_image(path):
+    """Расширение файла по формату изображения; ValidationError, если
+    это не изображение допустимого формата и размера"""
+    try:
+        # Формат и размеры читаются из заголовка, до распаковки.
+        with Image.open(path) as image:
+            if image.format not in constants.IMAGE_UPLOAD_FORMATS:
+                raise serializers.ValidationError(
+                    "Допустимые форматы: "
+                    + ", ".join(constants.IMAGE_UPLOAD_FORMATS)
+                )
+            if max(image.size) > constants.IMAGE_UPLOAD_MAX_SIDE:
+                raise serializers.ValidationError(
+                    "Стороны изображения должны быть не больше "
+                    f"{constants.IMAGE_UPLOAD_MAX_SIDE} пикселей"
+                )
+            image.verify()
+            return f".{image.format.lower()}"
+    except serializers.ValidationError:
+        raise
+    except Exception:
+        raise serializers.ValidationError(
+            "Загрузите корректное изображение"
+        )
+
+
+def finish(upload):
+    """Проверяет полностью загруженный файл. Непригодная загрузка
+    удаляется вместе с файлом"""
+    try:
+        upload.extension = check_image(get_path(upload))
+    except serializers.ValidationError:
+        discard(upload)
+        raise
+    upload.save(update_fields=["extension", "modified"])
+
+
+def discard(upload):
+    upload.delete()
+    get_path(upload).unlink(missing_ok=True)
+
+
+def save_file(upload, uploaded_file):
+    """Переносит файл multipart-запроса в UPLOADS_ROOT и проверяет его"""
+    Path(settings.UPLOADS_ROOT).mkdir(parents=True, exist_ok=True)
+    file_move_safe(
+        uploaded_file.temporary_file_path(),
+        get_path(upload),
+        allow_overwrite=True,
+    )
+    finish(upload)
+
+
+def append(upload, stream, offset):
+    """Дописывает часть из stream, начиная с offset. Возвращает новое
+    смещение; завершённая загрузка проверяется"""
+    Path(settings.UPLOADS_ROOT).mkdir(parents=True, exist_ok=True)
+    with open(get_path(upload), "ab") as file:
+        try:
+            # Одновременные части одной загрузки не смешиваются.
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise OffsetConflict(get_offset(upload))
+        current = os.fstat(file.fileno()).st_size
+        if upload.is_complete or offset != current:
+            raise OffsetConflict(current)
+        remaining = upload.size - current
+        while remaining >= 0:
+            chunk = stream.read(
+                min(constants.IMAGE_UPLOAD_READ_SIZE, remaining + 1)
+            )
+            if not chunk:
+                break
+            if len(chunk) > remaining:
+                file.flush()
+                file.truncate(offset)
+                raise serializers.ValidationError(
+                    "Данных больше объявленного размера загрузки"
+                )
+            file.write(chunk)
+            current += len(chunk)
+            remaining -= len(chunk)
+        file.flush()
+    if current == upload.size:
+        finish(upload)
+    return current
+
+
+@contextmanager
+def use_upload(validated_data):
+    """На время сохранения рецепта подставляет файл загрузки из поля
+    image_upload в поле image и закрывает его после сохранения, в том
+    числе при ошибке. Загрузка удаляется в транзакции сохранения рецепта,
+    файл - после её фиксации"""
+    upload = validated_data.pop("image_upload", None)
+    if upload is None:
+        yield
+        return
+    path = get_path(upload)
+    with open(path, "rb") as file:
+        validated_data["image"] = File(
+            file, name=f"image{upload.extension}"
+        )
+        yield
+    upload.delete()
+    transaction.on_commit(lambda: path.unlink(missing_ok=True))
@@ -2,11 +2,17 @@ from django.urls import include, path
 
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+from .views import (
+    ImageUploadViewSet,
+    IngredientViewSet,
+    RecipeViewSet,
+    TagViewSet
+)
 
 router = DefaultRouter()
 router.register("recipes", RecipeViewSet, basename="Recipes")
 router.register("ingredients", IngredientViewSet, basename="Ingredients")
 router.register("tags", TagViewSet, basename="Tags")
+router.register("uploads", ImageUploadViewSet, basename="Uploads")
 
 urlpatterns = [path("", include(router.urls))]
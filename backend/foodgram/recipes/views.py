@@ -1,15 +1,27 @@
+from io import BytesIO
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.http import HttpResponse
+from django.db import models, transaction
+from django.http import Http404
 
 from django_filters.rest_framework import DjangoFilterBackend
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen.canvas import Canvas
+from helpfiles import constants
+from helpfiles.conditional import ConditionalGetMixin, latest, make_etag
+from helpfiles.db_routing import NonAtomicReadsMixin, ReplicaReadsMixin
+from helpfiles.fields import SparseFieldsViewMixin
+from helpfiles.files import protected_file_response
+from helpfiles.optimizer import QuerysetOptimizationMixin
+from helpfiles.renderers import ORJSONRenderer, is_plain_json
+from helpfiles.timeouts import StatementTimeoutMixin
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
+from rest_framework.mixins import (
+    CreateModelMixin,
+    ListModelMixin,
+    RetrieveModelMixin
+)
 from rest_framework.permissions import (
     AllowAny,
     IsAuthenticated,
@@ -17,14 +29,29 @@ from rest_framework.permissions import (
 )
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
+from users.models import Sub
 from users.pagination import FoodgramPaginator
 
-from . import generate_pdf
+from . import uploads
+from .catalogs import INGREDIENTS_CACHE_KEY, TAGS_CACHE_KEY, CatalogMixin
+from .deletion import soft_delete_recipes
+from .exports import get_export, get_export_name
+from .fast_serializers import serialize_recipes
+from .feed import feed_response, get_feed_entry, get_feed_key
 from .filters import IngredientsSearchFilter, RecipeFilter
-from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .models import (
+    Favorite,
+    ImageUpload,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (
+    ImageUploadSerializer,
     IngredientSerializer,
+    RecipeBatchSerializer,
     RecipeReadSerializer,
     RecipeSerializer,
     RecipeWriteSerializer,
@@ -34,23 +61,64 @@ from .serializers import (
 User = get_user_model()
 
 
-class TagViewSet(RetrieveModelMixin, ListModelMixin, GenericViewSet):
+class TagViewSet(
+    ReplicaReadsMixin,
+    NonAtomicReadsMixin,
+    CatalogMixin,
+    QuerysetOptimizationMixin,
+    RetrieveModelMixin,
+    ListModelMixin,
+    GenericViewSet,
+):
     permission_classes = [AllowAny]
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
     pagination_class = None
+    catalog_cache_key = TAGS_CACHE_KEY
 
 
-class IngredientViewSet(RetrieveModelMixin, ListModelMixin, GenericViewSet):
+class IngredientViewSet(
+    StatementTimeoutMixin,
+    ReplicaReadsMixin,
+    NonAtomicReadsMixin,
+    CatalogMixin,
+    QuerysetOptimizationMixin,
+    RetrieveModelMixin,
+    ListModelMixin,
+    GenericViewSet,
+):
     permission_classes = [AllowAny]
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     pagination_class = None
     search_fields = ["^name"]
     filter_backends = [IngredientsSearchFilter]
+    catalog_cache_key = INGREDIENTS_CACHE_KEY
+    throttle_scopes = {"list": "ingredient_search"}
+    statement_timeout_scopes = {"list": "ingredient_search"}
+
+    def is_catalog_request(self, request):
+        return super().is_catalog_request(request) and not (
+            request.query_params.get(IngredientsSearchFilter.search_param)
+        )
 
+    def get_throttles(self):
+        # Справочник целиком отдаётся из кэша и не ограничивается.
+        if self.is_catalog_request(self.request):
+            return []
+        return super().get_throttles()
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(
+    StatementTimeoutMixin,
+    ReplicaReadsMixin,
+    NonAtomicReadsMixin,
+    ConditionalGetMixin,
+    SparseFieldsViewMixin,
+    QuerysetOptimizationMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Recipe.objects.all()
     pagination_class = FoodgramPaginator
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     filter_backends = (
@@ -59,6 +127,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     filterset_class = RecipeFilter
     http_method_names = ["get", "post", "patch", "create", "delete"]
+    sparse_actions = ("list", "retrieve", "popular", "similar")
+    # Остальные действия чтения собирают ответ из values_list.
+    optimized_actions = ("retrieve",)
+    throttle_scopes = {
+        "create": "recipe_write",
+        "partial_update": "recipe_write",
+        "download_shopping_cart": "shopping_cart_pdf",
+    }
+    statement_timeout_scopes = {
+        "list": "recipe_list",
+        "download_shopping_cart": "shopping_cart_pdf",
+    }
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
@@ -68,37 +148,153 @@ class RecipeViewSet(viewsets.ModelViewSet):
             is_in_shopping_cart = ShoppingCart.objects.filter(
                 recipe=models.OuterRef("pk"), user=self.request.user
             )
+            author_is_subscribed = Sub.objects.filter(
+                subscription=models.OuterRef("author"), user=self.request.user
+            )
         else:
             is_favorited = Favorite.objects.none()
             is_in_shopping_cart = ShoppingCart.objects.none()
+            author_is_subscribed = Sub.objects.none()
         return (
-            Recipe.objects.all()
-            .select_related("author")
-            .prefetch_related(
-                "tags", "ingredients", "favorites", "shopping_cart"
-            )
+            super()
+            .get_queryset()
             .annotate(
                 is_favorited=models.Exists(is_favorited),
                 is_in_shopping_cart=models.Exists(is_in_shopping_cart),
+                author_is_subscribed=models.Exists(author_is_subscribed),
+            )
+        )
+
+    def get_validators_queryset(self, queryset):
+        """Поля, от которых зависит представление рецепта: карточка
+        пересобирается при изменении автора, тегов и ингредиентов, и
+        дата её изменения заменяет их даты"""
+        return queryset.prefetch_related(None).values_list(
+            "pk",
+            "modified",
+            "card__modified",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "author_is_subscribed",
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_authenticated and is_plain_json(request):
+            key = get_feed_key(request)
+            if key is not None:
+                return feed_response(
+                    request,
+                    get_feed_entry(key, lambda: self.render_list(request)),
+                )
+        return self.get_page_response(
+            request, self.filter_queryset(self.get_queryset())
+        )
+
+    def render_list(self, request):
+        """Тело страницы списка для кэша ленты"""
+        fields = self.get_sparse_fields()
+        rows = self.paginate_queryset(
+            self.get_validators_queryset(
+                self.filter_queryset(self.get_queryset())
+            )
+        )
+        return ORJSONRenderer().render(
+            self.get_paginated_response(
+                serialize_recipes(rows, request, fields)
+            ).data
+        )
+
+    def get_page_response(self, request, queryset):
+        """Страница рецептов с ETag по строкам валидаторов"""
+        fields = self.get_sparse_fields()
+        rows = self.paginate_queryset(
+            self.get_validators_queryset(queryset)
+        )
+        etag = make_etag(
+            request.build_absolute_uri(),
+            self.paginator.page.paginator.count,
+            rows,
+        )
+
+        return self.conditional_response(
+            etag,
+            None,
+            lambda: self.get_paginated_response(
+                serialize_recipes(rows, request, fields)
+            ),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        row = None
+        if str(kwargs[self.lookup_field]).isdigit():
+            row = (
+                self.get_validators_queryset(self.get_queryset())
+                .filter(pk=kwargs[self.lookup_field])
+                .first()
             )
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)
+        last_modified = None
+        if not request.user.is_authenticated:
+            last_modified = latest(*row[1:3])
+        return self.conditional_response(
+            make_etag(request.build_absolute_uri(), row),
+            last_modified,
+            lambda: Response(serialize_recipes([row], request, fields)[0]),
         )
 
     def get_serializer_class(self):
-        if self.action in ("list", "retrieve"):
+        if self.action in self.sparse_actions:
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def perform_destroy(self, instance):
+        # Рецепт сразу скрывается, а избранное, списки покупок и
+        # ингредиенты удаляет пачками команда purge_deleted.
+        soft_delete_recipes(Recipe.objects.filter(pk=instance.pk))
+
+    @action(detail=True, methods=["get"])
+    def similar(self, request, pk):
+        """Рецепты из таблицы update_similar_recipes по убыванию
+        сходства"""
+        if not pk.isdigit() or not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        fields = self.get_sparse_fields()
+        rows = list(
+            self.get_validators_queryset(
+                self.get_queryset()
+                .filter(neighbor_of__recipe_id=pk)
+                .order_by("-neighbor_of__score", "pk")
+            )
+        )
+        return self.conditional_response(
+            make_etag(request.build_absolute_uri(), rows),
+            None,
+            lambda: Response(serialize_recipes(rows, request, fields)),
+        )
+
+    @action(detail=False, methods=["get"])
+    def popular(self, request):
+        """Рецепты по убыванию оценок update_popularity"""
+        return self.get_page_response(
+            request,
+            self.filter_queryset(self.get_queryset())
+            .filter(popularity__isnull=False)
+            .order_by("-popularity__score", "pk"),
+        )
+
     @action(
         detail=True,
         methods=["post"],
         permission_classes=[IsAuthenticated],
     )
     def favorite(self, request, pk):
-        return self.add_to(Favorite, request.user, pk)
+        return self.add_one(Favorite, request.user, pk)
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk):
-        return self.delete_from(Favorite, request.user, pk)
+        return self.delete_one(Favorite, request.user, pk)
 
     @action(
         detail=True,
@@ -106,31 +302,95 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated],
     )
     def shopping_cart(self, request, pk):
-        return self.add_to(ShoppingCart, request.user, pk)
+        return self.add_one(ShoppingCart, request.user, pk)
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk):
-        return self.delete_from(ShoppingCart, request.user, pk)
+        return self.delete_one(ShoppingCart, request.user, pk)
 
-    def add_to(self, model, user, pk):
-        if model.objects.filter(user=user, recipe__id=pk).exists():
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        recipe = Recipe.objects.filter(id=pk).first()
-        if recipe is None:
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="favorite",
+        url_name="favorite-batch",
+        permission_classes=[IsAuthenticated],
+    )
+    def favorite_batch(self, request):
+        return self.batch(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="shopping_cart",
+        url_name="shopping-cart-batch",
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart_batch(self, request):
+        return self.batch(ShoppingCart, request)
+
+    def add_to(self, model, user, recipe_ids):
+        """Добавляет рецепты одним запросом, возвращает пары
+        (статус, данные) в порядке recipe_ids"""
+        added = model.objects.add(user, recipe_ids)
+        results = []
+        for recipe_id in recipe_ids:
+            recipe, created = added.get(recipe_id, (None, False))
+            if created:
+                results.append(
+                    (
+                        status.HTTP_201_CREATED,
+                        RecipeSerializer(recipe).data,
+                    )
+                )
+            else:
+                results.append((status.HTTP_400_BAD_REQUEST, None))
+        return results
+
+    def delete_from(self, model, user, recipe_ids):
+        """Удаляет рецепты одним запросом, возвращает статусы в порядке
+        recipe_ids"""
+        deleted = model.objects.remove(user, recipe_ids)
+        results = []
+        for recipe_id in recipe_ids:
+            if recipe_id not in deleted:
+                results.append(status.HTTP_404_NOT_FOUND)
+            elif deleted[recipe_id]:
+                results.append(status.HTTP_204_NO_CONTENT)
+            else:
+                results.append(status.HTTP_400_BAD_REQUEST)
+        return results
+
+    def add_one(self, model, user, pk):
+        if not pk.isdigit():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        model.objects.create(user=user, recipe=recipe)
-        serializer = RecipeSerializer(recipe)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-    def delete_from(self, model, user, pk):
-        recipe = Recipe.objects.filter(id=pk).first()
-        obj = model.objects.filter(user=user, recipe__id=pk)
-        if recipe is None:
+        status_code, data = self.add_to(model, user, [int(pk)])[0]
+        return Response(data, status=status_code)
+
+    def delete_one(self, model, user, pk):
+        if not pk.isdigit():
             return Response(status=status.HTTP_404_NOT_FOUND)
-        if obj.exists():
-            obj.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=self.delete_from(model, user, [int(pk)])[0])
+
+    def batch(self, model, request):
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data["recipes"]
+        if request.method == "POST":
+            results = [
+                {"id": recipe_id, "status": status_code, "recipe": data}
+                for recipe_id, (status_code, data) in zip(
+                    recipe_ids, self.add_to(model, request.user, recipe_ids)
+                )
+            ]
+        else:
+            results = [
+                {"id": recipe_id, "status": status_code}
+                for recipe_id, status_code in zip(
+                    recipe_ids,
+                    self.delete_from(model, request.user, recipe_ids),
+                )
+            ]
+        return Response({"results": results})
 
     @action(
         detail=False,
@@ -141,7 +401,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         my_ingredients = (
             ShoppingCart.objects.filter(
-                user=request.user,
+                user=request.user, recipe__deleted_at__isnull=True
             )
             .values("recipe__ingredients")
             .annotate(
@@ -156,35 +416,114 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 "total_amount",
                 "measurement_unit",
             )
+            .order_by("ingredient", "measurement_unit")
         )
-        return generate_pdf_response(my_ingredients)
+        ingredients = list(my_ingredients)
+        return self.conditional_response(
+            make_etag(get_export_name(ingredients)),
+            None,
+            lambda: self.get_export_response(ingredients),
+        )
+
+    def get_export_response(self, ingredients):
+        name, path = get_export(ingredients)
+        return protected_file_response(
+            path, settings.EXPORTS_URL + name, "application/pdf", "file.pdf"
+        )
+
 
+class ImageUploadViewSet(
+    CreateModelMixin,
+    RetrieveModelMixin,
+    GenericViewSet,
+):
+    """Загрузка изображений рецептов целиком (multipart, поле image) или
+    частями: POST с размером, затем PATCH с заголовком Upload-Offset"""
 
-def generate_pdf_response(ingredients):
-    pdfmetrics.registerFont(
-        TTFont(
-            generate_pdf.PDF_FONT_NAME,
-            generate_pdf.PDF_FONT_DIR / generate_pdf.PDF_FONT_FILE,
+    serializer_class = ImageUploadSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = "token"
+    lookup_value_regex = "[0-9a-f-]{36}"
+    http_method_names = ["get", "head", "post", "patch", "options"]
+    throttle_scopes = {"create": "image_upload"}
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        # Приём тела может быть долгим, поэтому он идёт вне транзакции
+        # ATOMIC_REQUESTS, а записи в БД - отдельными запросами.
+        view = super().as_view(*args, **initkwargs)
+        return transaction.non_atomic_requests(view)
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        if (
+            self.get_queryset().count()
+            >= constants.IMAGE_UPLOAD_MAX_PENDING
+        ):
+            raise ValidationError(
+                "Слишком много неиспользованных загрузок, "
+                "дождитесь их удаления"
+            )
+        if request.content_type.startswith("multipart/form-data"):
+            return self.create_from_file(request)
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def create_from_file(self, request):
+        handler = uploads.ImageUploadHandler(request)
+        request.upload_handlers = [handler]
+        image = request.FILES.get("image")
+        if handler.too_large:
+            raise ValidationError(
+                {
+                    "image": [
+                        f"Файл больше {constants.IMAGE_UPLOAD_MAX_SIZE} байт"
+                    ]
+                }
+            )
+        if image is None:
+            raise ValidationError({"image": ["Обязательное поле"]})
+        upload = ImageUpload.objects.create(
+            user=request.user, size=image.size
         )
-    )
-    buffer = HttpResponse(content_type="application/pdf")
-    buffer["Content-Disposition"] = 'attachment; filename="file.pdf"'
-    canvas = Canvas(buffer)
-    canvas.setFont(
-        generate_pdf.PDF_FONT_NAME, generate_pdf.PDF_TITLE_FONT_SIZE
-    )
-    canvas.drawCentredString(
-        A4[0] / 2, A4[1] - generate_pdf.PDF_INDENT, "Список покупок:"
-    )
-    canvas.setFont(generate_pdf.PDF_FONT_NAME, generate_pdf.PDF_TEXT_FONT_SIZE)
-    for index, ingredient in enumerate(ingredients):
-        canvas.drawString(
-            generate_pdf.PDF_INDENT,
-            A4[1]
-            - generate_pdf.PDF_INDENT
-            - (generate_pdf.PDF_TEXT_FONT_SIZE + generate_pdf.PDF_GAP)
-            * (index + 1),
-            (f"{ingredient[0]} {ingredient[1]} {ingredient[2]}"),
-        )
-    canvas.save()
-    return buffer
+        try:
+            uploads.save_file(upload, image)
+        except ValidationError as error:
+            raise ValidationError({"image": error.detail})
+        return Response(
+            self.get_serializer(upload).data, status=status.HTTP_201_CREATED
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response[uploads.OFFSET_HEADER] = response.data["offset"]
+        return response
+
+    def partial_update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        content_type = request.content_type.split(";")[0].strip()
+        if content_type not in uploads.CONTENT_TYPES:
+            raise UnsupportedMediaType(content_type)
+        offset = request.headers.get(uploads.OFFSET_HEADER, "")
+        if not offset.isdigit():
+            raise ValidationError(
+                {uploads.OFFSET_HEADER: ["Должно быть числом"]}
+            )
+        try:
+            uploads.append(upload, request.stream or BytesIO(), int(offset))
+        except uploads.OffsetConflict as conflict:
+            return Response(
+                {
+                    "detail": "Часть должна начинаться с текущего смещения",
+                    "offset": conflict.offset,
+                },
+                status=status.HTTP_409_CONFLICT,
+                headers={uploads.OFFSET_HEADER: conflict.offset},
+            )
+        except ValidationError as error:
+            raise ValidationError({"image": error.detail})
+        return self.retrieve(request, *args, **kwargs)
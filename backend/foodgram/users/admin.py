@@ -1,14 +1,21 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as UserAdminClass
 
+from helpfiles.deletion import SoftDeleteAdminMixin
+from helpfiles.pagination import EstimatedCountPaginator
+from recipes.deletion import soft_delete_users
+
 from .models import User
 
 
-class UserAdmin(UserAdminClass):
-    list_filter = ("username", "email")
-    search_fields = ("username", "email")
+class UserAdmin(SoftDeleteAdminMixin, UserAdminClass):
+    list_filter = ("is_staff", "is_active")
+    search_fields = ("^username", "^email")
     list_display = ("username", "first_name", "last_name", "email")
     list_display_links = ("username", "first_name", "last_name", "email")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    soft_delete_func = staticmethod(soft_delete_users)
 
 
 admin.site.register(User, UserAdmin)
@@ -0,0 +1,79 @@
+"""
+Быстрая сериализация подписок: тот же JSON, что и у
+UserWithRecipeSerializer, из строк values_list.
+"""
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from recipes.fast_serializers import get_image_url
+from recipes.models import Recipe
+from rest_framework import serializers
+
+USER_FIELDS = (
+    "email",
+    "id",
+    "username",
+    "first_name",
+    "last_name",
+    "recipes_count",
+)
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get("recipes_limit")
+    if not recipes_limit:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+        if recipes_limit < 0:
+            raise ValueError
+    except ValueError:
+        raise serializers.ValidationError(
+            {"recipes_limit": "Должно быть числом"}
+        )
+    return recipes_limit
+
+
+def serialize_subscriptions(rows, request):
+    """rows - строки USER_FIELDS авторов, на которых подписан
+    пользователь запроса"""
+    if not rows:
+        return []
+    recipes_limit = get_recipes_limit(request)
+    recipes = Recipe.objects.filter(author_id__in=[row[1] for row in rows])
+    if recipes_limit is not None:
+        # Лимит на автора считается в БД, а не срезом всех его рецептов.
+        recipes = recipes.annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=(F("created").desc(), F("id").asc()),
+            )
+        ).filter(position__lte=recipes_limit)
+    author_recipes = defaultdict(list)
+    for author_id, *recipe in recipes.values_list(
+        "author_id", "id", "name", "image", "cooking_time"
+    ):
+        author_recipes[author_id].append(
+            {
+                "id": recipe[0],
+                "name": recipe[1],
+                "image": get_image_url(recipe[2]),
+                "cooking_time": recipe[3],
+            }
+        )
+    return [
+        {
+            "email": row[0],
+            "id": row[1],
+            "username": row[2],
+            "first_name": row[3],
+            "last_name": row[4],
+            "recipes": author_recipes[row[1]],
+            "recipes_count": row[5],
+            "is_subscribed": True,
+        }
+        for row in rows
+    ]
@@ -1,11 +1,17 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as BaseUserManager
+from django.contrib.postgres.indexes import OpClass
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.models.functions import Upper
 
 from helpfiles import constants
-from helpfiles.Basemodel import BaseModelMixin
+from helpfiles.Basemodel import BaseModelMixin, SoftDeleteManager
 
-from foodgram.settings import USERNAME_CHARSET
+
+class UserManager(SoftDeleteManager, BaseUserManager):
+    pass
 
 
 class User(AbstractUser, BaseModelMixin):
@@ -22,7 +28,7 @@ class User(AbstractUser, BaseModelMixin):
         max_length=constants.USERNAME_MAX_LEM,
         validators=[
             RegexValidator(
-                USERNAME_CHARSET,
+                settings.USERNAME_CHARSET,
                 message="Имя пользователя содержит недопустимый символ",
             ),
         ],
@@ -43,6 +49,18 @@ class User(AbstractUser, BaseModelMixin):
         verbose_name="Подписки",
         through="Sub",
     )
+    deleted_at = models.DateTimeField(
+        verbose_name="Удалён",
+        null=True,
+        blank=True,
+        help_text="Пользователь скрыт и будет удалён командой purge_deleted",
+    )
+
+    # Удалённые пользователи не видны в API и не могут войти, но
+    # занимают почту и имя до удаления командой purge_deleted.
+    objects = UserManager()
+    all_objects = BaseUserManager()
+
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["first_name", "last_name", "username"]
 
@@ -56,6 +74,22 @@ class User(AbstractUser, BaseModelMixin):
             ),
             models.UniqueConstraint(fields=("email",), name="unique_email"),
         )
+        # Поиск в админке по началу имени и почты (istartswith).
+        indexes = (
+            models.Index(
+                OpClass(Upper("username"), name="text_pattern_ops"),
+                name="user_username_search_idx",
+            ),
+            models.Index(
+                OpClass(Upper("email"), name="text_pattern_ops"),
+                name="user_email_search_idx",
+            ),
+            models.Index(
+                fields=("deleted_at",),
+                condition=models.Q(deleted_at__isnull=False),
+                name="user_deleted_idx",
+            ),
+        )
 
     def __str__(self):
         return self.username
@@ -73,3 +107,9 @@ class Sub(BaseModelMixin):
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
         ordering = ("id",)
+        indexes = [
+            models.Index(
+                fields=["user", "subscription"],
+                name="sub_user_subscription_idx",
+            )
+        ]
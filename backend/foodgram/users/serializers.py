@@ -5,9 +5,10 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.db.models import Count
 
-from recipes.models import Recipe
+from helpfiles.fields import SparseFieldsMixin
+from helpfiles.optimizer import optimize_queryset
+from recipes.models import Recipe, count_recipes
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
@@ -22,7 +23,7 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "image", "cooking_time")
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -39,6 +40,8 @@ class UserSerializer(serializers.ModelSerializer):
     def get_is_subscribed(self, obj):
         """Проверяет подписан ли авторизированный пользователь на
         пользователя"""
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             return request.user.subs.filter(subscription=obj.id).exists()
@@ -72,9 +75,9 @@ class UserWithRecipeSerializer(serializers.ModelSerializer):
     def get_recipes(self, obj):
         request = self.context.get("request")
         recipes_limit = request.query_params.get("recipes_limit")
-        recipes = obj.recipes.all().prefetch_related(
-            "tags",
-            "ingredients",
+        # Связанный менеджер проставляет рецептам автора по author_id.
+        recipes = optimize_queryset(
+            obj.recipes.all(), ShortRecipeSerializer(), ("author",)
         )
         if recipes_limit:
             try:
@@ -95,12 +98,12 @@ class UserCreateSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(
         required=True,
         max_length=254,
-        validators=[UniqueValidator(User.objects.all())],
+        validators=[UniqueValidator(User.all_objects.all())],
     )
     username = serializers.CharField(
         required=True,
         max_length=150,
-        validators=[UniqueValidator(User.objects.all())],
+        validators=[UniqueValidator(User.all_objects.all())],
     )
     first_name = serializers.CharField(max_length=150, required=True)
     last_name = serializers.CharField(max_length=150, required=True)
@@ -165,11 +168,7 @@ class UserSubscriptionSerializer(serializers.Serializer):
     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
 
     sub = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all()
-        .annotate(recipes_count=Count("recipes"))
-        .prefetch_related(
-            "recipes",
-        )
+        queryset=User.objects.all().annotate(recipes_count=count_recipes())
     )
 
     def to_representation(self, instance):
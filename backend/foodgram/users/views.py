@@ -1,7 +1,12 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Count
+from django.db.models import Exists, OuterRef
 from django.shortcuts import get_object_or_404
 
+from helpfiles.conditional import ConditionalGetMixin, make_etag
+from helpfiles.db_routing import NonAtomicReadsMixin, ReplicaReadsMixin
+from helpfiles.fields import SparseFieldsViewMixin
+from helpfiles.optimizer import QuerysetOptimizationMixin
+from recipes.models import count_recipes
 from rest_framework import mixins, status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -9,35 +14,82 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
+from .fast_serializers import USER_FIELDS, serialize_subscriptions
+from .models import Sub
 from .pagination import FoodgramPaginator
 from .serializers import (
     PasswordSerializer,
     UserCreateSerializer,
     UserSerializer,
-    UserSubscriptionSerializer,
-    UserWithRecipeSerializer
+    UserSubscriptionSerializer
 )
 
 User = get_user_model()
 
 
 class UserViewSet(
+    ReplicaReadsMixin,
+    NonAtomicReadsMixin,
+    ConditionalGetMixin,
+    SparseFieldsViewMixin,
+    QuerysetOptimizationMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     GenericViewSet,
 ):
-    queryset = User.objects.all().prefetch_related(
-        "recipes", "recipes__ingredients", "recipes__tags"
-    )
+    queryset = User.objects.all()
     permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if (
+            fields is not None
+            and "is_subscribed" in fields
+            and self.request.user.is_authenticated
+        ):
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Sub.objects.filter(
+                        user=self.request.user, subscription=OuterRef("pk")
+                    )
+                )
+            )
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
             return UserSerializer
         if self.action == "create":
             return UserCreateSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_field]
+        row = None
+        if str(pk).isdigit():
+            if request.user.is_authenticated:
+                is_subscribed = Sub.objects.filter(
+                    user=request.user, subscription=OuterRef("pk")
+                )
+            else:
+                is_subscribed = Sub.objects.none()
+            row = (
+                User.objects.filter(pk=pk)
+                .annotate(is_subscribed=Exists(is_subscribed))
+                .values_list("modified", "is_subscribed")
+                .first()
+            )
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            make_etag(pk, self.get_sparse_fields(), *row),
+            None if request.user.is_authenticated else row[0],
+            lambda: super(UserViewSet, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
     @action(
         detail=False,
         url_path="me",
@@ -46,7 +98,13 @@ class UserViewSet(
         permission_classes=[IsAuthenticated],
     )
     def get_me(self, request):
-        return Response(self.serializer_class(instance=request.user).data)
+        return self.conditional_response(
+            make_etag(request.user.pk, request.user.modified),
+            None,
+            lambda: Response(
+                self.serializer_class(instance=request.user).data
+            ),
+        )
 
     @action(
         detail=False,
@@ -66,20 +124,11 @@ class UserViewSet(
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class Subscribe(APIView):
+class Subscribe(ReplicaReadsMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk, format=None):
-        sub = get_object_or_404(
-            User.objects.all()
-            .annotate(recipes_count=Count("recipes"))
-            .prefetch_related(
-                "recipes",
-                "recipes__ingredients",
-                "recipes__tags",
-            ),
-            pk=pk,
-        )
+        sub = get_object_or_404(User, pk=pk)
 
         subscription = {
             "sub": pk,
@@ -119,17 +168,11 @@ class Subscriptions(APIView, FoodgramPaginator):
     def get(self, request, format=None):
         query_set = (
             request.user.subscriptions.all()
-            .annotate(recipes_count=Count("recipes"))
-            .prefetch_related(
-                "recipes",
-                "recipes__ingredients",
-                "recipes__tags",
-            )
+            .annotate(recipes_count=count_recipes())
+            .values_list(*USER_FIELDS)
         )
 
         page = self.paginate_queryset(query_set, request)
-        serializer = UserWithRecipeSerializer(
-            instance=page, many=True, context={"request": request}
+        return self.get_paginated_response(
+            serialize_subscriptions(page, request)
         )
-
-        return self.get_paginated_response(serializer.data)